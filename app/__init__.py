@@ -1,14 +1,27 @@
-import os
+import sys
+
 from flask_api import FlaskAPI
-from flask_sqlalchemy import SQLAlchemy
-from flask_cors import CORS, cross_origin
+from flask_cors import CORS
 
 from instance.config import app_config
+from app.token_cache import token_cache
+from app.cache import response_cache
+from app.encoders import encoder
+from app.metrics import metrics
+from app.pool import SQLAlchemy
+from app.replica import replica
 
 # initialize sql-alchemy
 db = SQLAlchemy()
 
 
+def on_gevent():
+    """Tells whether gevent patched the standard library of this process,
+    as run_async.py and gunicorn's gevent workers do."""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
 def create_app(config_name):
     """creates an app instance
     :param config_name: The name of the confiuration;
@@ -21,10 +34,29 @@ def create_app(config_name):
     app.config.from_object(app_config[config_name])
     app.config.from_pyfile('config.py')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    if on_gevent():
+        # every greenlet of the worker draws from the same pool
+        app.config['SQLALCHEMY_POOL_SIZE'] = app.config['GEVENT_POOL_SIZE']
+        # forking a process pool under gevent's patched threads and queues
+        # can deadlock the worker, passwords are hashed on gevent's own
+        # thread pool instead
+        app.config['PASSWORD_HASH_WORKERS'] = 0
     db.init_app(app)
+    from app.models import enforce_sqlite_foreign_keys
+    enforce_sqlite_foreign_keys(app)
+    # first in, so its after_request hook runs last and times the others
+    metrics.init_app(app)
+    token_cache.init_app(app)
+    response_cache.init_app(app)
+    encoder.init_app(app)
+    replica.init_app(app)
+
+    from app.transaction import unit_of_work
+    unit_of_work.init_app(app)
 
     from app.auth import authenticate_blueprint
     app.register_blueprint(authenticate_blueprint)
-    return app
 
-app = create_app(os.getenv('APP_SETTINGS'))
+    from app.views import api
+    app.register_blueprint(api)
+    return app
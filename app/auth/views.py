@@ -1,10 +1,11 @@
 from flask.views import MethodView
-from flask import jsonify, request, make_response
+from flask import request, make_response
 
 import re
 
 
 from . import authenticate_blueprint
+from app.encoders import jsonify
 from app.models import User
 
 EMAIL_REGEX = re.compile(r"(^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$)")
@@ -75,6 +76,10 @@ class SignInView(MethodView):
                     username=request.data["username"]).first()
                 # Authenticate the user using the password
                 if user and user.verify_password(request.data["password"]):
+                    if user.password_needs_rehash():
+                        # upgrade the hash now that we know the password
+                        user.password = request.data["password"]
+                        user.save()
                     # Generate the access token which will be used
                     # as the authorization header
                     token = user.generate_auth_token(user.id)
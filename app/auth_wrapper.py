@@ -1,8 +1,11 @@
+import hmac
 from functools import wraps
 
-from flask import jsonify, request, make_response
+from flask import current_app, g, request, make_response
 
+from app.encoders import jsonify
 from app.models import User
+from app.token_cache import token_cache
 
 
 def evaluate_auth(function):
@@ -11,9 +14,20 @@ def evaluate_auth(function):
         header = request.headers.get("Authorization")
         if header:
             token = header
-            # extract user_id from token
-            user_id = User.verify_token(token)
+            # clients polling with the same token skip the signature check
+            user_id = token_cache.get(token)
+            if user_id is None:
+                # extract user_id from token
+                payload = User.decode_token(token)
+                if isinstance(payload, str):
+                    user_id = payload
+                else:
+                    user_id = payload['sub']
+                    token_cache.set(token, user_id, payload['exp'])
             if not isinstance(user_id, str):
+                # lets app.replica keep the user's reads on the primary
+                # right after they wrote
+                g.user_id = user_id
                 return function(user_id=user_id, *args, **kwargs)
             else:
                 response = jsonify({
@@ -30,3 +44,27 @@ def evaluate_auth(function):
             return make_response(jsonify(response)), 401
 
     return decorator
+
+
+def metrics_auth(function):
+    """Serves a view only to scrapers sending the METRICS_TOKEN as a bearer
+    token. Without a token configured the view answers 404, as if it did
+    not exist."""
+    @wraps(function)
+    def decorator(*args, **kwargs):
+        token = current_app.config.get('METRICS_TOKEN')
+        if not token:
+            response = {
+                "message": "Metrics are disabled"
+            }
+            return make_response(jsonify(response)), 404
+        header = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(header.encode(),
+                                   "Bearer {}".format(token).encode()):
+            response = {
+                "message": "Send the metrics token to access this resource"
+            }
+            return make_response(jsonify(response)), 401
+        return function(*args, **kwargs)
+
+    return decorator
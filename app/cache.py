@@ -0,0 +1,325 @@
+import base64
+import json
+import os
+import sqlite3
+import stat
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, current_app, make_response
+
+
+class MemoryBackend(object):
+    """An in-process LRU store bounded by entry count and total size."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        # (user id, key) -> (expiry, size, value), least recently used first
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._generations = {}
+
+    def get(self, user_id, key):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                self._remove((user_id, key))
+                return None
+            self._entries.move_to_end((user_id, key))
+            return entry[2]
+
+    def set(self, user_id, key, value, ttl, generation):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(user_id, 0) != generation:
+                # the user wrote since the response was built
+                return
+            self._remove((user_id, key))
+            self._entries[(user_id, key)] = (time.time() + ttl, size, value)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            self.size += size
+            while (len(self._entries) > self.max_entries or
+                   self.size > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def generation(self, user_id):
+        return self._generations.get(user_id, 0)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            for key in self._user_keys.pop(user_id, ()):
+                entry = self._entries.pop((user_id, key), None)
+                if entry is not None:
+                    self.size -= entry[1]
+
+    def count(self):
+        return len(self._entries)
+
+    def _remove(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is not None:
+            self.size -= entry[1]
+            self._user_keys.get(entry_key[0], set()).discard(entry_key[1])
+
+
+def _check_private(status, name):
+    if status.st_uid != os.getuid() or stat.S_IMODE(status.st_mode) & 0o077:
+        raise PermissionError(
+            '{} must belong to this user and be private to it'.format(name))
+
+
+def private_directory(directory):
+    """Creates a directory that only the current user can use, with mode
+    0700. Refuses one that someone else owns or can reach, e.g. one
+    planted in a shared temporary directory.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _check_private(os.stat(directory), directory)
+
+
+def private_file(path):
+    """Creates the file at path, and its directory, so that only the
+    current user can read or write them: the directory with mode 0700 and
+    the file with 0600. Refuses a directory or file that someone else
+    owns or can reach, e.g. one planted in a shared temporary directory.
+    """
+    private_directory(os.path.dirname(os.path.abspath(path)))
+    descriptor = os.open(path, os.O_RDWR | os.O_CREAT |
+                         getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    try:
+        _check_private(os.fstat(descriptor), path)
+    finally:
+        os.close(descriptor)
+
+
+class SQLiteBackend(object):
+    """A local key-value store in a SQLite file, standing in for a shared
+    cache server: every worker process on the host sees the same entries
+    and invalidations."""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _connection(self):
+        # connections are per thread and never cross a fork
+        if getattr(self._local, 'pid', None) != os.getpid():
+            private_file(self.path)
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (user_id INTEGER, '
+                'key TEXT, value BLOB, expires REAL, '
+                'PRIMARY KEY (user_id, key))')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS generations ('
+                'user_id INTEGER PRIMARY KEY, generation INTEGER)')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    def get(self, user_id, key):
+        row = self._connection().execute(
+            'SELECT value FROM entries WHERE user_id = ? AND key = ? '
+            'AND expires > ?', (user_id, key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, user_id, key, value, ttl, generation):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if self._generation(connection, user_id) == generation:
+                connection.execute(
+                    'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)',
+                    (user_id, key, sqlite3.Binary(value), time.time() + ttl))
+                connection.execute(
+                    'DELETE FROM entries WHERE expires <= ? OR rowid IN ('
+                    'SELECT rowid FROM entries ORDER BY expires DESC '
+                    'LIMIT -1 OFFSET ?)', (time.time(), self.max_entries))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def generation(self, user_id):
+        return self._generation(self._connection(), user_id)
+
+    @staticmethod
+    def _generation(connection, user_id):
+        row = connection.execute(
+            'SELECT generation FROM generations WHERE user_id = ?',
+            (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, user_id):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT OR REPLACE INTO generations VALUES (?, ?)',
+                (user_id, self._generation(connection, user_id) + 1))
+            connection.execute('DELETE FROM entries WHERE user_id = ?',
+                               (user_id,))
+            connection.execute('COMMIT')
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+
+    def count(self):
+        return self._connection().execute(
+            'SELECT count(*) FROM entries').fetchone()[0]
+
+
+class ResponseCache(object):
+    """Caches successful GET responses per user and normalized request.
+
+    A user's entries are dropped whenever one of their rows is written, see
+    the save() and delete() methods of the models. Each entry also records
+    the user's generation when its response was built, so that a response
+    racing with a write is never stored.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 0
+        self.max_entry_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Picks the backend named by the RESPONSE_CACHE_BACKEND setting."""
+        backend = app.config.get('RESPONSE_CACHE_BACKEND')
+        if backend == 'memory':
+            self.backend = MemoryBackend(
+                app.config['RESPONSE_CACHE_MAX_ENTRIES'],
+                app.config['RESPONSE_CACHE_MAX_BYTES'])
+        elif backend == 'sqlite':
+            self.backend = SQLiteBackend(
+                app.config['RESPONSE_CACHE_PATH'],
+                app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif backend:
+            raise ValueError('Unknown response cache backend {}'.format(backend))
+        else:
+            self.backend = None
+        self.ttl = app.config.get('RESPONSE_CACHE_TTL', 60)
+        self.max_entry_bytes = app.config.get('RESPONSE_CACHE_MAX_ENTRY_BYTES',
+                                              1024 * 1024)
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key():
+        """The path plus the sorted query arguments of the current request."""
+        args = sorted(request.args.items(multi=True))
+        return request.path + '?' + '&'.join(
+            '{}={}'.format(name, value) for name, value in args)
+
+    @staticmethod
+    def encode(status, headers, body):
+        """Stores a response as JSON, which unlike pickle cannot run code
+        when read back from a file someone else may have written."""
+        return json.dumps({
+            "status": status,
+            "headers": headers,
+            "body": base64.b64encode(body).decode('ascii')
+        }).encode('utf-8')
+
+    @staticmethod
+    def decode(value):
+        """Reads back the status, headers and body of an encoded response."""
+        entry = json.loads(value.decode('utf-8'))
+        return (entry["status"], [tuple(header) for header in entry["headers"]],
+                base64.b64decode(entry["body"]))
+
+    def invalidate_user(self, user_id):
+        """Drops every cached response of a user."""
+        if self.backend is not None and user_id is not None:
+            self.backend.invalidate(user_id)
+
+    def cached(self, function):
+        """Decorates a view taking a user_id keyword argument, i.e. one
+        wrapped in evaluate_auth, so its GET responses are cached."""
+        @wraps(function)
+        def decorator(*args, **kwargs):
+            user_id = kwargs.get('user_id')
+            if self.backend is None or request.method != 'GET':
+                return function(*args, **kwargs)
+
+            key = self.key()
+            value = self.backend.get(user_id, key)
+            if value is not None:
+                self.hits += 1
+                status, headers, body = self.decode(value)
+                response = current_app.response_class(
+                    body, status=status, headers=headers)
+                return response.make_conditional(request)
+
+            self.misses += 1
+            generation = self.backend.generation(user_id)
+            response = make_response(function(*args, **kwargs))
+            if response.status_code == 200:
+                self._store(user_id, key, generation, response)
+            return response
+
+        return decorator
+
+    def _store(self, user_id, key, generation, response):
+        def store(body):
+            if len(body) <= self.max_entry_bytes:
+                headers = [(name, value) for name, value in response.headers
+                           if name.lower() != 'content-length']
+                self.backend.set(user_id, key, self.encode(
+                    response.status_code, headers, body), self.ttl,
+                    generation)
+
+        if not response.is_streamed:
+            store(response.get_data())
+            return
+
+        # keep a copy of a streamed body as it goes out, giving up once it
+        # grows past the largest entry worth caching
+        chunks = response.response
+
+        def tee():
+            copy, size = [], 0
+            try:
+                for chunk in chunks:
+                    if copy is not None:
+                        encoded = chunk.encode('utf-8') if isinstance(
+                            chunk, str) else chunk
+                        copy.append(encoded)
+                        size += len(encoded)
+                        if size > self.max_entry_bytes:
+                            copy = None
+                    yield chunk
+            finally:
+                if hasattr(chunks, 'close'):
+                    chunks.close()
+            if copy is not None:
+                store(b''.join(copy))
+
+        response.response = tee()
+
+    def stats(self):
+        """Returns the hit ratio and size of the cache."""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "entries": self.backend.count() if self.backend else 0
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,86 @@
+import hashlib
+
+from flask import request, current_app
+
+from app import db
+from app.models import User
+
+
+class Validators(object):
+    """The ETag and Last-Modified of a resource, computed from the rows'
+    date_modified or the owner's data_version rather than from the
+    response body, so that a conditional GET can be answered before
+    anything is serialised.
+    """
+
+    def __init__(self, parts, last_modified=None):
+        """
+        :param parts: Values that change whenever the representation does.
+        :param last_modified: When the rows last changed, if known.
+        """
+        self.etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+        self.last_modified = last_modified
+
+    def is_fresh(self):
+        """Tells whether the client's cached copy is still current.
+        If-None-Match takes precedence over If-Modified-Since."""
+        if request.if_none_match:
+            return request.if_none_match.contains(self.etag)
+        since = request.if_modified_since
+        if since and self.last_modified:
+            # HTTP dates have no sub-second precision and are always GMT
+            since = since.replace(tzinfo=None)
+            return self.last_modified.replace(microsecond=0) <= since
+        return False
+
+    def apply(self, response):
+        """Adds the validators to a response and returns it."""
+        response.set_etag(self.etag)
+        if self.last_modified:
+            response.last_modified = self.last_modified
+        # every client sees only their own data, and should revalidate
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+
+    def not_modified(self):
+        """Returns the 304 response telling a client to use its copy."""
+        return self.apply(current_app.response_class(status=304))
+
+
+def _user_version(user_id):
+    return db.session.query(
+        User.data_version, User.data_modified).filter(
+        User.id == user_id).first() or (None, None)
+
+
+def bucketlist_validators(bucketlist):
+    """Validators of a bucketlist together with its items, built from the
+    owner's data_version: two writes within the same second, e.g. an
+    item renamed right after another, leave every timestamp alike."""
+    version, modified = _user_version(bucketlist.created_by)
+    return Validators(('bucketlist', bucketlist.id, version), modified)
+
+
+def items_validators(bucketlist):
+    """Validators of the item collection of a bucketlist, built from the
+    owner's data_version like bucketlist_validators."""
+    version, modified = _user_version(bucketlist.created_by)
+    return Validators(('items', bucketlist.id, version), modified)
+
+
+def item_validators(item):
+    """Validators of a single bucketlist item."""
+    return Validators(('item', item.id, item.name, item.done,
+                       item.date_modified), item.date_modified)
+
+
+def listing_validators(user_id):
+    """Validators of everything a user's bucketlist listing can show, built
+    from their data_version: a primary key lookup, however much data they
+    own. Every write to their bucketlists or items moves it, see
+    app.models.user_changed.
+    """
+    version, modified = _user_version(user_id)
+    return Validators(
+        ('listing', user_id, request.query_string, version), modified)
@@ -0,0 +1,76 @@
+import datetime
+
+from flask import current_app, json as flask_json
+from flask_api.renderers import JSONRenderer as BaseJSONRenderer
+
+from app.metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder is used instead
+    orjson = None
+
+
+class JSONEncoder(flask_json.JSONEncoder):
+    """Flask's encoder writing dates and datetimes as ISO-8601, the format
+    orjson produces natively, rather than as HTTP dates."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.date, datetime.time)):
+            return o.isoformat()
+        return super(JSONEncoder, self).default(o)
+
+
+class Encoder(object):
+    """Turns response data into compact JSON text with the backend named by
+    the JSON_ENCODER_BACKEND setting: 'orjson', 'stdlib', or 'auto' for
+    orjson when it is installed and the stdlib otherwise.
+    """
+
+    def __init__(self):
+        self.backend = 'stdlib'
+        self._fallback = JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+    def init_app(self, app):
+        backend = app.config.get('JSON_ENCODER_BACKEND', 'auto')
+        if backend == 'auto':
+            backend = 'orjson' if orjson is not None else 'stdlib'
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError('JSON_ENCODER_BACKEND is orjson but orjson is '
+                               'not installed')
+        if backend not in ('orjson', 'stdlib'):
+            raise ValueError('Unknown JSON encoder backend {}'.format(backend))
+        self.backend = backend
+        app.json_encoder = JSONEncoder
+
+    def dumps(self, data):
+        """Returns the JSON text of data."""
+        with metrics.timed('serialization_seconds'):
+            if self.backend == 'orjson':
+                # orjson handles datetimes itself and hands anything else it
+                # does not know to the stdlib encoder's default()
+                return orjson.dumps(data,
+                                    default=self._fallback.default).decode()
+            return self._fallback.encode(data)
+
+
+encoder = Encoder()
+
+
+def jsonify(*args, **kwargs):
+    """A drop-in for flask.jsonify writing compact JSON with the configured
+    backend."""
+    data = args[0] if len(args) == 1 and not kwargs else dict(*args, **kwargs)
+    return current_app.response_class(
+        encoder.dumps(data) + '\n',
+        mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+class JSONRenderer(BaseJSONRenderer):
+    """Renders the dicts and lists views return with the configured backend,
+    keeping FlaskAPI's indented output for clients asking for it."""
+
+    def render(self, data, media_type, **options):
+        if 'indent' in media_type.params or 'indent' in options:
+            return super(JSONRenderer, self).render(data, media_type, **options)
+        return encoder.dumps(data)
@@ -0,0 +1,69 @@
+import threading
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    """Returns the process pool that hashes passwords, creating it on first
+    use so that it is never inherited across a fork. None means hashing
+    runs in the worker itself: inline, or on gevent's thread pool."""
+    global _executor
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # multiprocessing is slow to import, so only pay for it here
+            from concurrent.futures import ProcessPoolExecutor
+            _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+def _run(function, *args):
+    from app import on_gevent
+
+    timeout = current_app.config.get('PASSWORD_HASH_TIMEOUT')
+    pool = _pool()
+    if pool is not None:
+        # the calling thread waits without holding the GIL, and the hashing
+        # itself never takes more cores than the pool has processes.
+        return pool.submit(function, *args).result(timeout=timeout)
+    if on_gevent():
+        import gevent
+
+        # pbkdf2 releases the GIL, so the worker's other greenlets keep
+        # being served while one of the hub's threads hashes
+        return gevent.get_hub().threadpool.spawn(function, *args).get(
+            timeout=timeout)
+    return function(*args)
+
+
+def hash_password(password):
+    """Hashes a password with the configured PASSWORD_HASH_METHOD."""
+    return _run(generate_password_hash, password,
+                current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def check_password(password_hash, password):
+    """Checks a password against a hash made by hash_password."""
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Tells whether a hash was made with other than the configured method,
+    e.g. with fewer iterations than the current work factor."""
+    method = password_hash.split('$', 1)[0]
+    return method != current_app.config['PASSWORD_HASH_METHOD']
+
+
+def shutdown():
+    """Stops the hashing processes, e.g. before the worker exits."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
@@ -0,0 +1,303 @@
+import bisect
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.cache import private_directory
+
+# upper bounds, in seconds, of the request latency histogram's buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# what a request spends its time on, each exported as a counter per
+# endpoint, method and status
+TIMINGS = {
+    'sql_statements': 'SQL statements executed.',
+    'sql_seconds': 'Seconds spent executing SQL statements.',
+    'jwt_seconds': 'Seconds spent encoding and decoding JWTs.',
+    'serialization_seconds': 'Seconds spent encoding JSON responses.',
+}
+# per-process counters of the caches and the connection pool
+PROCESS_COUNTERS = {
+    'token_cache_hits': 'Tokens found already verified.',
+    'token_cache_misses': 'Tokens whose signature had to be checked.',
+    'response_cache_hits': 'Responses served from the response cache.',
+    'response_cache_misses': 'Cacheable responses that had to be built.',
+    'pool_checkouts': 'Connections taken from the pool.',
+    'pool_timeouts': 'Requests that gave up waiting for a connection.',
+    'pool_wait_seconds': 'Seconds spent waiting for a connection.',
+}
+PREFIX = 'bucketlist_'
+
+
+class Metrics(object):
+    """Records per endpoint, method and status how long requests take and
+    how much of it goes to SQL, JWTs and JSON encoding, and reports it in
+    Prometheus' text format.
+
+    Each process keeps its own numbers. With METRICS_DIR set, every
+    process also writes them, at most once per METRICS_FLUSH_INTERVAL
+    seconds, to a file of its own there, and reports the sum of all the
+    files: any gunicorn worker then answers for all of them. A disabled
+    app registers no hooks at all.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 1
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._path = None
+        self._flushed = 0
+        # (endpoint, method, status) -> observations per bucket, the last
+        # one above every bound, followed by their sum
+        self._latency = {}
+        # (endpoint, method, status) -> totals of TIMINGS
+        self._timings = {}
+        self._process = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1)
+        with self._lock:
+            self._reset()
+        if not self.enabled:
+            return
+        if self.directory:
+            private_directory(self.directory)
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        if not event.contains(Engine, 'before_cursor_execute',
+                              _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute',
+                         _after_cursor_execute)
+
+    def _start_request(self):
+        timings = dict.fromkeys(TIMINGS, 0)
+        timings['start'] = time.perf_counter()
+        g.request_metrics = timings
+
+    def _end_request(self, response):
+        timings = g.get('request_metrics')
+        if timings is None:
+            return response
+        key = (request.endpoint or 'unmatched', request.method,
+               str(response.status_code))
+        if response.is_streamed:
+            # the body, and the queries behind it, are still to come
+            response.call_on_close(lambda: self.record(key, timings))
+        else:
+            self.record(key, timings)
+        return response
+
+    def add(self, name, value):
+        """Adds to one of the TIMINGS of the current request, if any."""
+        if has_app_context():
+            timings = g.get('request_metrics')
+            if timings is not None:
+                timings[name] += value
+
+    @contextmanager
+    def timed(self, name):
+        """Adds the time spent in the block to one of the TIMINGS of the
+        current request."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def record(self, key, timings):
+        """Counts a finished request.
+        :param key: The request's endpoint, method and status code.
+        :param timings: The TIMINGS of the request and its start time.
+        """
+        elapsed = time.perf_counter() - timings['start']
+        with self._lock:
+            self._check_process()
+            latency = self._latency.get(key)
+            if latency is None:
+                latency = self._latency[key] = [0] * (
+                    len(LATENCY_BUCKETS) + 1) + [0.0]
+            latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            latency[-1] += elapsed
+            totals = self._timings.setdefault(key, dict.fromkeys(TIMINGS, 0))
+            for name in TIMINGS:
+                totals[name] += timings[name]
+            self._snapshot_process()
+        if self.directory and time.time() - self._flushed >= self.flush_interval:
+            self.flush()
+
+    def _check_process(self):
+        # a forked worker starts over rather than count its parent's requests
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def _snapshot_process(self):
+        from app.cache import response_cache
+        from app.token_cache import token_cache
+
+        self._process.update(token_cache_hits=token_cache.hits,
+                             token_cache_misses=token_cache.misses,
+                             response_cache_hits=response_cache.hits,
+                             response_cache_misses=response_cache.misses)
+        # the pool is only reachable from an app context, a streamed
+        # response ends outside of it
+        if has_app_context():
+            from app import db
+            from app.pool import InstrumentedQueuePool
+
+            pool = db.engine.pool
+            if isinstance(pool, InstrumentedQueuePool):
+                self._process.update(pool_checkouts=pool.checkouts,
+                                     pool_timeouts=pool.timeouts,
+                                     pool_wait_seconds=pool.wait_total)
+
+    def _state(self):
+        return {
+            'latency': [[list(key), counts]
+                        for key, counts in self._latency.items()],
+            'timings': [[list(key), totals]
+                        for key, totals in self._timings.items()],
+            'process': dict(self._process),
+        }
+
+    def flush(self):
+        """Writes the numbers of this process to its file in METRICS_DIR."""
+        with self._lock:
+            self._check_process()
+            if self._path is None:
+                # the start time tells apart processes reusing a pid
+                self._path = os.path.join(
+                    self.directory, 'metrics-{}-{}.json'.format(
+                        self._pid, int(time.time() * 1000)))
+            # a new file of this user's, never one somebody else put or
+            # linked there
+            descriptor, temporary = tempfile.mkstemp(
+                prefix='metrics-', suffix='.json.tmp', dir=self.directory)
+            try:
+                with os.fdopen(descriptor, 'w') as output:
+                    json.dump(self._state(), output)
+                # readers see either the previous file or this one, whole
+                os.replace(temporary, self._path)
+            except BaseException:
+                os.remove(temporary)
+                raise
+            self._flushed = time.time()
+
+    def states(self):
+        """Returns the numbers of this process and, with METRICS_DIR set,
+        those last written by every other one."""
+        with self._lock:
+            self._check_process()
+            self._snapshot_process()
+            states = [self._state()]
+            own = self._path
+        if self.directory:
+            paths = glob.glob(os.path.join(self.directory, 'metrics-*.json'))
+            for path in paths:
+                if path == own:
+                    continue
+                try:
+                    with open(path) as source:
+                        states.append(json.load(source))
+                except (OSError, ValueError):  # removed or being replaced
+                    continue
+        return states
+
+    def render(self):
+        """Returns the metrics of every process summed, as Prometheus
+        text."""
+        latency, timings, process = {}, {}, {}
+        for state in self.states():
+            for key, counts in state['latency']:
+                total = latency.setdefault(tuple(key), [0] * len(counts))
+                for index, count in enumerate(counts):
+                    total[index] += count
+            for key, totals in state['timings']:
+                total = timings.setdefault(tuple(key), dict.fromkeys(TIMINGS, 0))
+                for name in TIMINGS:
+                    total[name] += totals.get(name, 0)
+            for name, value in state['process'].items():
+                process[name] = process.get(name, 0) + value
+
+        lines = []
+        name = PREFIX + 'request_duration_seconds'
+        lines.append('# HELP {} Seconds from the start of a request to the '
+                     'end of its response.'.format(name))
+        lines.append('# TYPE {} histogram'.format(name))
+        for key in sorted(latency):
+            counts = latency[key]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _labels(key, le=bound), cumulative))
+            lines.append('{}_sum{} {}'.format(name, _labels(key), counts[-1]))
+            lines.append('{}_count{} {}'.format(name, _labels(key),
+                                                cumulative))
+        for timing, description in sorted(TIMINGS.items()):
+            name = PREFIX + timing + '_total'
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} counter'.format(name))
+            for key in sorted(timings):
+                lines.append('{}{} {}'.format(name, _labels(key),
+                                              timings[key][timing]))
+        for counter, description in sorted(PROCESS_COUNTERS.items()):
+            if counter not in process:
+                continue
+            name = PREFIX + counter + '_total'
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} counter'.format(name))
+            lines.append('{} {}'.format(name, process[counter]))
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(key, **extra):
+    labels = list(zip(('endpoint', 'method', 'status'), key))
+    labels.extend(sorted(extra.items()))
+    return '{' + ','.join('{}="{}"'.format(
+        label, str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n')) for label, value in labels) + '}'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    start = conn.info.pop('metrics_query_start', None)
+    if start is not None:
+        metrics.add('sql_seconds', time.perf_counter() - start)
+        metrics.add('sql_statements', 1)
+
+
+def clear_directory(directory):
+    """Removes the files processes wrote to a METRICS_DIR, for a server
+    starting over."""
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+metrics = Metrics()
@@ -2,11 +2,16 @@ import datetime
 import jwt
 
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import DDL, event, inspect
+from sqlalchemy.orm import Session
 from flask import current_app
 from instance.config import Config
 
 from app import db
+from app.cache import response_cache
+from app.hashing import hash_password, check_password, needs_rehash
+from app.metrics import metrics
+from app.transaction import unit_of_work
 
 
 class User(UserMixin, db.Model):
@@ -17,8 +22,16 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(255), nullable=False, unique=True)
     email = db.Column(db.String(256), nullable=False, unique=True)
     user_password = db.Column(db.String(255), nullable=False)
+    # moved by every write to the user's bucketlists and items, see
+    # user_changed; the ETag of their listing is built from it
+    data_version = db.Column(db.Integer, nullable=False, default=0,
+                             server_default='0')
+    data_modified = db.Column(db.DateTime)
+    # the database deletes the bucketlists of a deleted user, and their
+    # items, rather than the session loading and deleting them row by row
     bucketlists = db.relationship('BucketList', order_by="BucketList.id",
-                                  cascade="all,delete-orphan")
+                                  cascade="all,delete-orphan",
+                                  passive_deletes=True)
 
     def __init__(self, username, password, email):
         """Initializes the user model
@@ -40,16 +53,21 @@ class User(UserMixin, db.Model):
         """Generates a hash from the password entered by the user
         :param password: A string representing the user password.
         """
-        self.user_password = generate_password_hash(password)
+        self.user_password = hash_password(password)
 
     def verify_password(self, password):
         """Checks the user password against tje hash stored in the database
         to valicate user.
         :param password: A string representing the user password
         """
-        return check_password_hash(self.user_password, password)
+        return check_password(self.user_password, password)
 
-    def generate_auth_token(self, user_id):
+    def password_needs_rehash(self):
+        """Tells whether the stored hash predates the current work factor."""
+        return needs_rehash(self.user_password)
+
+    @staticmethod
+    def generate_auth_token(user_id):
         """ Generates the access token"""
 
         try:
@@ -60,11 +78,12 @@ class User(UserMixin, db.Model):
                 'sub': user_id
             }
             # create the byte string token using the payload and the SECRET key
-            jwt_string = jwt.encode(
-                payload,
-                Config.SECRET_KEY,
-                algorithm='HS256'
-            )
+            with metrics.timed('jwt_seconds'):
+                jwt_string = jwt.encode(
+                    payload,
+                    Config.SECRET_KEY,
+                    algorithm='HS256'
+                )
             return jwt_string
 
         except Exception as e:
@@ -74,10 +93,18 @@ class User(UserMixin, db.Model):
     @staticmethod
     def verify_token(token):
         """Decodes the access token from the Authorization header."""
+        payload = User.decode_token(token)
+        if isinstance(payload, str):
+            return payload
+        return payload['sub']
+
+    @staticmethod
+    def decode_token(token):
+        """Decodes the access token, returning its whole payload."""
         try:
             # try to decode the token using our SECRET variable
-            payload = jwt.decode(token, current_app.config.get('SECRET_KEY'))
-            return payload['sub']
+            with metrics.timed('jwt_seconds'):
+                return jwt.decode(token, current_app.config.get('SECRET_KEY'))
         except jwt.ExpiredSignatureError:
             # the token is expired, return an error string
             return "Expired token. Please login to get a new token."
@@ -89,13 +116,22 @@ class User(UserMixin, db.Model):
         """Saves a user to the database.
         May be creating a user or updating an existing one."""
         db.session.add(self)
-        db.session.commit()
+        unit_of_work.flush()
+        # ids may be reused once rows are gone, so never trust older entries
+        user_changed(self.id)
+        unit_of_work.commit()
 
 
 class BucketList(db.Model):
     """This class represents the bucketlist table."""
 
     __tablename__ = 'bucketlists'
+    __table_args__ = (
+        # listing and keyset pagination of a user's bucketlists
+        db.Index('ix_bucketlists_created_by_id', 'created_by', 'id'),
+        # duplicate name check on creation
+        db.Index('ix_bucketlists_created_by_name', 'created_by', 'name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255))
@@ -103,7 +139,18 @@ class BucketList(db.Model):
     date_modified = db.Column(
         db.DateTime, default=db.func.current_timestamp(),
         onupdate=db.func.current_timestamp())
-    created_by = db.Column(db.Integer, db.ForeignKey(User.id))
+    created_by = db.Column(db.Integer,
+                           db.ForeignKey(User.id, ondelete='CASCADE'))
+    # counters of the bucketlist's items and of those done, kept up to date
+    # by every write to bucketlistitems, see count_items
+    item_count = db.Column(db.Integer, nullable=False, default=0,
+                           server_default='0')
+    done_count = db.Column(db.Integer, nullable=False, default=0,
+                           server_default='0')
+    # the items are left to ON DELETE CASCADE unless already loaded
+    items = db.relationship('BucketListItem', order_by="BucketListItem.id",
+                            cascade="all,delete-orphan", backref="bucketlist",
+                            passive_deletes=True)
 
     def __init__(self, name, created_by):
         """Initializes  with name author of the bucketlist.
@@ -117,7 +164,8 @@ class BucketList(db.Model):
         """Saves a bucketlist into the database.
         Could be editing a new bucketlist or editing a pre existing one."""
         db.session.add(self)
-        db.session.commit()
+        user_changed(self.created_by)
+        unit_of_work.commit()
 
     @staticmethod
     def get_all():
@@ -126,7 +174,8 @@ class BucketList(db.Model):
 
     def delete(self):
         db.session.delete(self)
-        db.session.commit()
+        user_changed(self.created_by)
+        unit_of_work.commit()
 
     def __repr__(self):
         return "<BucketList: {}>".format(self.name)
@@ -135,14 +184,20 @@ class BucketList(db.Model):
 class BucketListItem(db.Model):
     """This class represents the bucketlist_item table"""
     __tablename__ = 'bucketlistitems'
+    __table_args__ = (
+        db.Index('ix_bucketlistitems_bucketlist_id_id', 'bucketlist_id', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255))
     date_created = db.Column(db.DateTime, default=db.func.current_timestamp())
     date_modified = db.Column(db.DateTime, default=db.func.current_timestamp(),
                               onupdate=db.func.current_timestamp())
-    done = db.Column(db.Boolean, default=False)
-    bucketlist_id = db.Column(db.Integer, db.ForeignKey(BucketList.id))
+    # the value replaced is loaded first, for the done_count of the bucketlist
+    done = db.column_property(db.Column(db.Boolean, default=False),
+                              active_history=True)
+    bucketlist_id = db.Column(db.Integer,
+                              db.ForeignKey(BucketList.id, ondelete='CASCADE'))
 
     def __init__(self, name, bucketlist_id):
         """
@@ -155,8 +210,125 @@ class BucketListItem(db.Model):
 
     def save(self):
         """Saves all the bucktlist items to the database."""
+        owner_id = self.owner_id()
         db.session.add(self)
-        db.session.commit()
+        user_changed(owner_id)
+        unit_of_work.commit()
+
+    @staticmethod
+    def bulk_create(bucketlist_id, names):
+        """Creates many items in a bucketlist, in the current transaction.
+        Where the database supports RETURNING the rows are written with one
+        multi-row INSERT, otherwise with one INSERT per row.
+        :param bucketlist_id: The id of the bucketlist receiving the items.
+        :param names: A list of item names.
+        :return: The created rows, in the order of names.
+        """
+        table = BucketListItem.__table__
+        rows = [{"name": name, "bucketlist_id": bucketlist_id} for name in names]
+        if db.session.get_bind().dialect.implicit_returning:
+            created = sorted(db.session.execute(
+                table.insert().values(rows).returning(*table.c)).fetchall(),
+                key=lambda row: row.id)
+        else:
+            ids = [db.session.execute(table.insert().values(row))
+                   .inserted_primary_key[0] for row in rows]
+            created = db.session.execute(
+                table.select().where(table.c.id.in_(ids)).order_by(
+                    table.c.id)).fetchall()
+        count_items(db.session, bucketlist_id, len(created))
+        owner_id = BucketList.query.get(bucketlist_id).created_by
+        user_changed(owner_id)
+        unit_of_work.commit()
+        return created
+
+    @staticmethod
+    def bulk_insert(rows):
+        """Adds item rows to the current transaction with one executemany,
+        without loading them back. Used where the caller does not need the
+        created items, e.g. when importing.
+        :param rows: A list of dicts holding name, bucketlist_id and done.
+        """
+        if rows:
+            db.session.execute(BucketListItem.__table__.insert(), rows)
+        counts = {}
+        for row in rows:
+            count = counts.setdefault(row["bucketlist_id"], [0, 0])
+            count[0] += 1
+            count[1] += 1 if row.get("done") else 0
+        for bucketlist_id, (items, done) in counts.items():
+            count_items(db.session, bucketlist_id, items, done)
+
+    @staticmethod
+    def bulk_update(bucketlist_id, owner_id, done=None, name=None, ids=None,
+                    done_filter=None, name_filter=None):
+        """Sets done and/or the name of many items of a bucketlist, in the
+        current transaction. Ownership is checked by the UPDATE itself, and
+        only the rows it changes are written: setting done alone, or the
+        name alone, is a single UPDATE; setting both takes two.
+        :param bucketlist_id: The id of the bucketlist holding the items.
+        :param owner_id: The id of the user who must own the bucketlist.
+        :param done: The new done status, if changing.
+        :param name: The new name, if changing.
+        :param ids: The ids of the items to update, all of them if None.
+        :param done_filter: Only updates the items with this done status.
+        :param name_filter: Only updates the items whose name contains it.
+        :return: The number of items updated and the date_modified written
+        to them, None if none was.
+        """
+        table = BucketListItem.__table__
+        buckets = BucketList.__table__
+        matched = [table.c.bucketlist_id == bucketlist_id,
+                   table.c.bucketlist_id.in_(db.select([buckets.c.id]).where(
+                       db.and_(buckets.c.id == bucketlist_id,
+                               buckets.c.created_by == owner_id)))]
+        if ids is not None:
+            matched.append(table.c.id.in_(ids))
+        if done_filter is not None:
+            matched.append(table.c.done.is_(True) if done_filter
+                           else table.c.done.isnot(True))
+        if name_filter:
+            matched.append(db.func.lower(table.c.name).contains(
+                name_filter.lower(), autoescape=True))
+
+        updated = 0
+        if done is not None:
+            # only the rows changing state, so that they can be counted
+            changing = table.c.done.isnot(True) if done else table.c.done.is_(True)
+            values = {"done": done,
+                      "date_modified": db.func.current_timestamp()}
+            if name is not None:
+                values["name"] = name
+            flipped = db.session.execute(table.update().where(
+                db.and_(changing, *matched)).values(**values)).rowcount
+            count_items(db.session, bucketlist_id, 0,
+                        flipped if done else -flipped)
+            updated += flipped
+        if name is not None:
+            # the rows left, whose done status was already right
+            updated += db.session.execute(table.update().where(
+                db.and_(table.c.name.is_distinct_from(name), *matched)).values(
+                name=name, date_modified=db.func.current_timestamp())).rowcount
+        if not updated:
+            return 0, None
+        # read back what the database wrote: its CURRENT_TIMESTAMP is per
+        # transaction on PostgreSQL but per statement on SQLite, in whole
+        # seconds. The items written now hold the new values, and the
+        # latest date_modified among those is theirs.
+        written = [table.c.bucketlist_id == bucketlist_id]
+        if ids is not None:
+            written.append(table.c.id.in_(ids))
+        if done is not None:
+            written.append(table.c.done.is_(True) if done
+                           else table.c.done.isnot(True))
+        if name is not None:
+            written.append(table.c.name == name)
+        date_modified = db.session.execute(
+            db.select([db.func.max(table.c.date_modified)]).where(
+                db.and_(*written))).scalar()
+        user_changed(owner_id)
+        unit_of_work.commit()
+        return updated, date_modified
 
     @staticmethod
     def get_all_items():
@@ -165,5 +337,112 @@ class BucketListItem(db.Model):
         return BucketListItem.query.filter_by(bucketlist_id=BucketList.id)
 
     def delete(self):
+        owner_id = self.owner_id()
         db.session.delete(self)
-        db.session.commit()
+        user_changed(owner_id)
+        unit_of_work.commit()
+
+    def owner_id(self):
+        """Returns the id of the user owning the item's bucketlist. The
+        bucketlist is usually in the session already, costing no query."""
+        bucketlist = BucketList.query.get(self.bucketlist_id)
+        return bucketlist.created_by if bucketlist else None
+
+
+# full-text indexes used by app.search on PostgreSQL. They index an
+# expression rather than a column, so they are created here instead of in
+# __table_args__; the expression must match PostgresSearch exactly.
+for _table in (BucketList.__table__, BucketListItem.__table__):
+    event.listen(
+        _table, 'after_create',
+        DDL("CREATE INDEX ix_%(table)s_name_fts ON %(table)s "
+            "USING gin (to_tsvector('simple', coalesce(name, '')))").execute_if(
+            dialect='postgresql'))
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+def enforce_sqlite_foreign_keys(app):
+    """Makes every connection of an app's SQLite database enforce foreign
+    keys, which SQLite ignores unless each connection asks for them. The
+    models rely on their ON DELETE CASCADE.
+    :param app: The app whose engine to set up.
+    """
+    if (app.config.get('SQLALCHEMY_DATABASE_URI') or '').startswith('sqlite'):
+        with app.app_context():
+            event.listen(db.engine, 'connect', _enforce_foreign_keys)
+
+
+def user_changed(user_id):
+    """Records, in the current transaction, that a user's data changed:
+    their data_version moves, and their cached responses are dropped once
+    the transaction commits.
+    :param user_id: The id of the user, nothing is done if None.
+    """
+    if user_id is None:
+        return
+    table = User.__table__
+    db.session.execute(table.update().where(table.c.id == user_id).values(
+        data_version=table.c.data_version + 1,
+        data_modified=db.func.current_timestamp()))
+    unit_of_work.on_commit(response_cache.invalidate_user, user_id)
+
+
+def count_items(connection, bucketlist_id, items, done=0):
+    """Adds to the item_count and done_count of a bucketlist, in the
+    transaction of the write that changed its items. The counters are
+    incremented in place by the UPDATE, so concurrent writers queue on the
+    row rather than overwrite each other.
+    :param connection: The connection or session writing the items.
+    :param items: The change in the number of items.
+    :param done: The change in the number of items done.
+    """
+    if bucketlist_id is None or not (items or done):
+        return
+    table = BucketList.__table__
+    connection.execute(table.update().where(
+        table.c.id == bucketlist_id).values(
+        item_count=table.c.item_count + items,
+        done_count=table.c.done_count + done,
+        # the bucketlist itself has not changed
+        date_modified=table.c.date_modified))
+
+
+@event.listens_for(BucketListItem, 'after_insert')
+def _item_inserted(mapper, connection, item):
+    count_items(connection, item.bucketlist_id, 1, 1 if item.done else 0)
+
+
+@event.listens_for(BucketListItem, 'after_update')
+def _item_updated(mapper, connection, item):
+    done = inspect(item).attrs.done.history
+    moved = inspect(item).attrs.bucketlist_id.history
+    if moved.deleted:
+        was_done = done.deleted[0] if done.deleted else item.done
+        count_items(connection, moved.deleted[0], -1, -1 if was_done else 0)
+        count_items(connection, item.bucketlist_id, 1, 1 if item.done else 0)
+    elif done.deleted and bool(done.deleted[0]) != bool(item.done):
+        count_items(connection, item.bucketlist_id, 0, 1 if item.done else -1)
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_deleted_bucketlists(session, flush_context, instances):
+    # session.deleted copies every deleted object, so it is read once per
+    # flush rather than once per deleted item
+    session.info['deleted_bucketlists'] = {
+        instance.id for instance in session.deleted
+        if isinstance(instance, BucketList)}
+
+
+@event.listens_for(BucketListItem, 'before_delete')
+def _item_deleted(mapper, connection, item):
+    session = inspect(item).session
+    # items deleted along with their bucketlist leave no counters to update
+    if item.bucketlist_id not in session.info.get('deleted_bucketlists', ()):
+        # before the DELETE, while done can still be loaded if expired
+        count_items(connection, item.bucketlist_id, -1,
+                    -1 if item.done else 0)
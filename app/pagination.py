@@ -0,0 +1,89 @@
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def page_size(limit, default, maximum):
+    """Works out how many rows a page should hold.
+    :param limit: The raw `limit` query argument, possibly empty.
+    :param default: The page size to use when no valid limit is given.
+    :param maximum: The largest page size a client may ask for.
+    """
+    try:
+        size = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def page_number(page):
+    """Parses a 1-based `page` query argument, defaulting to the first page."""
+    try:
+        return max(1, int(page))
+    except (TypeError, ValueError):
+        return 1
+
+
+def encode_cursor(direction, key):
+    """Builds an opaque cursor pointing before or after a row.
+    :param direction: "next" for the rows after key, "prev" for the rows before.
+    :param key: The sort key of the row the cursor points at.
+    """
+    payload = json.dumps({"d": direction, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Reverses encode_cursor, returning a (direction, key) tuple."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        direction, key = payload["d"], int(payload["k"])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("Invalid pagination cursor.")
+    if direction not in ("next", "prev"):
+        raise InvalidCursor("Invalid pagination cursor.")
+    return direction, key
+
+
+class KeysetPage(object):
+    """A page of rows together with the cursors of its neighbours."""
+
+    def __init__(self, items, next_cursor, prev_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+def paginate_by_key(query, column, limit, cursor=None):
+    """Fetches a page of an unordered query using keyset pagination.
+    Rows are ordered by the unique column and every page is a plain range
+    scan on it, so deep pages cost the same as the first one.
+    :param query: The query to paginate, without an ORDER BY.
+    :param column: A unique, indexed column to order and seek on.
+    :param limit: The number of rows per page.
+    :param cursor: An opaque cursor from a previous page, if any.
+    """
+    direction, key = decode_cursor(cursor) if cursor else ("next", None)
+
+    if direction == "next":
+        if key is not None:
+            query = query.filter(column > key)
+        rows = query.order_by(column.asc()).limit(limit + 1).all()
+        has_next, has_prev = len(rows) > limit, key is not None
+        rows = rows[:limit]
+    else:
+        rows = query.filter(column < key).order_by(
+            column.desc()).limit(limit + 1).all()
+        has_next, has_prev = True, len(rows) > limit
+        rows = rows[:limit][::-1]
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor("next", getattr(rows[-1], column.key))
+    if rows and has_prev:
+        prev_cursor = encode_cursor("prev", getattr(rows[0], column.key))
+    return KeysetPage(rows, next_cursor, prev_cursor)
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+import flask_sqlalchemy
+from sqlalchemy import orm
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+from app.replica import RoutingSession
+
+# options only a queue of connections understands
+QUEUE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """A QueuePool counting checkouts and how long they waited for a
+    connection, including the time spent opening new ones."""
+
+    def __init__(self, *args, **kwargs):
+        super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._waiting = threading.local()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        if getattr(self._waiting, 'active', False):
+            # QueuePool retries by calling _do_get again
+            return super(InstrumentedQueuePool, self)._do_get()
+        self._waiting.active = True
+        start = time.time()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        except TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            self._waiting.active = False
+            waited = time.time() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        """Returns the pool's occupancy and wait times."""
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": max(self.overflow(), 0),
+                "max_overflow": self._max_overflow,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+                "wait_seconds_avg": (self.wait_total / self.checkouts
+                                     if self.checkouts else 0.0)
+            }
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """Flask-SQLAlchemy with an instrumented connection pool, the
+    SQLALCHEMY_POOL_PRE_PING setting and sessions reading from the replica
+    where app.replica allows it. Flask-SQLAlchemy itself passes on
+    SQLALCHEMY_POOL_SIZE, SQLALCHEMY_MAX_OVERFLOW, SQLALCHEMY_POOL_TIMEOUT
+    and SQLALCHEMY_POOL_RECYCLE."""
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        if info.drivername.startswith('sqlite'):
+            # SQLite connections are not shared between threads, so they
+            # keep the dialect's own pool
+            for option in QUEUE_OPTIONS:
+                options.pop(option, None)
+        else:
+            options['poolclass'] = InstrumentedQueuePool
+            if info.drivername.startswith('postgresql'):
+                # CURRENT_TIMESTAMP fills the columns without a time zone
+                # in the session's, and Last-Modified takes them for UTC
+                options.setdefault('connect_args', {}).setdefault(
+                    'options', '-c timezone=UTC')
+            # test connections on checkout, replacing those the server or a
+            # proxy closed while idle
+            options['pool_pre_ping'] = app.config.get(
+                'SQLALCHEMY_POOL_PRE_PING', False)
+        return super(SQLAlchemy, self).apply_driver_hacks(app, info, options)
+
+
+def pool_stats(engine):
+    """Describes the connection pool of an engine, for this process."""
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool": type(pool).__name__,
+             "status": pool.status()}
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(pool.stats())
+    return stats
@@ -0,0 +1,145 @@
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy import SignallingSession, get_state
+from sqlalchemy import event, text
+
+from app.cache import MemoryBackend, SQLiteBackend
+
+# the SQLALCHEMY_BINDS key of the read replica
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+
+# replay lag of a PostgreSQL standby, zero when it has replayed everything
+# it received; pg_last_xact_replay_timestamp() alone keeps growing while the
+# primary is idle.
+POSTGRES_LAG = (
+    "SELECT CASE WHEN {received} = {replayed} THEN 0 ELSE COALESCE("
+    "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END")
+POSTGRES_LSN_FUNCTIONS = {
+    'received': ('pg_last_wal_receive_lsn()', 'pg_last_xlog_receive_location()'),
+    'replayed': ('pg_last_wal_replay_lsn()', 'pg_last_xlog_replay_location()'),
+}
+
+
+class ReplicaRouter(object):
+    """Decides which requests may read from the replica.
+
+    Only GET and HEAD requests do, and only when the replica is reachable
+    and its lag is within REPLICA_MAX_LAG seconds. A user who committed a
+    write reads from the primary for the following
+    REPLICA_READ_YOUR_WRITES_WINDOW seconds, so they always see their own
+    changes. Recent writers are remembered in a backend from app.cache:
+    'memory' keeps them per worker, 'sqlite' shares them between the
+    workers of a host.
+    """
+
+    def __init__(self):
+        self.writers = None
+        self.window = 0
+        self.max_lag = 0
+        self.check_interval = 1
+        self._lock = threading.Lock()
+        self._lag = None
+        self._checked = 0
+
+    def init_app(self, app):
+        backend = app.config.get('REPLICA_WRITERS_BACKEND', 'memory')
+        max_entries = app.config.get('REPLICA_WRITERS_MAX_ENTRIES', 100000)
+        if not self.configured(app):
+            # every read goes to the primary, there is nothing to remember
+            self.writers = None
+        elif backend == 'memory':
+            # every entry holds a single byte
+            self.writers = MemoryBackend(max_entries, max_entries)
+        elif backend == 'sqlite':
+            self.writers = SQLiteBackend(app.config['REPLICA_WRITERS_PATH'],
+                                         max_entries)
+        else:
+            raise ValueError('Unknown replica writers backend {}'.format(
+                backend))
+        self.window = app.config.get('REPLICA_READ_YOUR_WRITES_WINDOW', 5)
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', 2)
+        self.check_interval = app.config.get('REPLICA_LAG_CHECK_INTERVAL', 1)
+        self._lag, self._checked = None, 0
+
+    @staticmethod
+    def configured(app):
+        return REPLICA_BIND in (app.config.get('SQLALCHEMY_BINDS') or {})
+
+    def wrote(self, user_id):
+        """Sends a user's reads to the primary for the next few seconds."""
+        if self.writers is not None and self.window > 0:
+            self.writers.set(user_id, 'wrote', b'1', self.window,
+                             self.writers.generation(user_id))
+
+    def recently_wrote(self, user_id):
+        return (self.writers is not None and
+                self.writers.get(user_id, 'wrote') is not None)
+
+    def lag(self, engine):
+        """Returns the replica's lag in seconds, None when it cannot be
+        reached. The value is refreshed at most every check interval."""
+        now = time.time()
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return self._lag
+            self._checked = now
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name == 'postgresql':
+                    modern = engine.dialect.server_version_info >= (10,)
+                    functions = dict(
+                        (name, pair[0] if modern else pair[1])
+                        for name, pair in POSTGRES_LSN_FUNCTIONS.items())
+                    lag = float(connection.execute(
+                        text(POSTGRES_LAG.format(**functions))).scalar())
+                else:
+                    # a second SQLite file or an unmonitored server
+                    connection.execute(text('SELECT 1'))
+                    lag = 0.0
+        except Exception:
+            current_app.logger.exception('Replica unavailable')
+            lag = None
+        self._lag = lag
+        return lag
+
+    def use_replica(self, app):
+        """Tells whether the queries of the current request may go to the
+        replica, deciding once per request."""
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        if not self.configured(app):
+            return False
+        decision = g.get('read_from_replica')
+        if decision is None:
+            user_id = g.get('user_id')
+            if user_id is not None and self.recently_wrote(user_id):
+                decision = False
+            else:
+                lag = self.lag(get_state(app).db.get_engine(
+                    app, bind=REPLICA_BIND))
+                decision = lag is not None and lag <= self.max_lag
+            g.read_from_replica = decision
+        return decision
+
+
+replica = ReplicaRouter()
+
+
+class RoutingSession(SignallingSession):
+    """A session sending the reads of GET and HEAD requests to the replica
+    and everything else, including any flush, to the primary."""
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and replica.use_replica(self.app):
+            return get_state(self.app).db.get_engine(self.app,
+                                                     bind=REPLICA_BIND)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_writer(session):
+    if has_request_context() and g.get('user_id') is not None:
+        replica.wrote(g.user_id)
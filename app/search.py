@@ -0,0 +1,213 @@
+import bisect
+import re
+import threading
+
+from flask import current_app
+from sqlalchemy import desc, event, func
+
+from app import db
+from app.models import User, BucketList, BucketListItem
+from app.transaction import unit_of_work
+
+# text search configuration used by the PostgreSQL expression indexes; it
+# must match the one in the migration for the planner to use them.
+TEXT_SEARCH_CONFIG = 'simple'
+
+# how much an item name hit counts towards its bucketlist's rank, relative
+# to a hit on the bucketlist name itself.
+ITEM_WEIGHT = 0.4
+
+TOKEN_REGEX = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Splits text into the lowercase terms that are indexed and searched."""
+    return TOKEN_REGEX.findall((text or '').lower())
+
+
+class SearchPage(object):
+    """A page of bucketlist ids ordered from the best match down."""
+
+    def __init__(self, bucketlist_ids, has_next):
+        self.bucketlist_ids = bucketlist_ids
+        self.has_next = has_next
+
+
+class PostgresSearch(object):
+    """Searches bucketlist and item names with the GIN-indexed tsvectors
+    of the bucketlists and bucketlistitems tables."""
+
+    @staticmethod
+    def _document(column):
+        return func.to_tsvector(TEXT_SEARCH_CONFIG, func.coalesce(column, ''))
+
+    def search(self, user_id, terms, limit, offset):
+        # every term is matched as a prefix so that "ski" finds "Skiing"
+        query = func.to_tsquery(
+            TEXT_SEARCH_CONFIG, ' & '.join(term + ':*' for term in terms))
+
+        name_document = self._document(BucketList.name)
+        name_hits = db.session.query(
+            BucketList.id.label('bucketlist_id'),
+            func.ts_rank(name_document, query).label('rank')).filter(
+            BucketList.created_by == user_id,
+            name_document.op('@@')(query))
+
+        item_document = self._document(BucketListItem.name)
+        item_hits = db.session.query(
+            BucketListItem.bucketlist_id.label('bucketlist_id'),
+            (func.ts_rank(item_document, query) * ITEM_WEIGHT).label('rank')).join(
+            BucketList, BucketList.id == BucketListItem.bucketlist_id).filter(
+            BucketList.created_by == user_id,
+            item_document.op('@@')(query))
+
+        hits = name_hits.union_all(item_hits).subquery()
+        rank = func.sum(hits.c.rank).label('rank')
+        rows = db.session.query(hits.c.bucketlist_id, rank).group_by(
+            hits.c.bucketlist_id).order_by(
+            desc(rank), hits.c.bucketlist_id).offset(offset).limit(limit + 1).all()
+        return SearchPage([row[0] for row in rows[:limit]], len(rows) > limit)
+
+
+class InvertedIndex(object):
+    """An in-process inverted index over bucketlist and item names, used
+    where the database has no full-text search of its own (SQLite).
+
+    A user's index is built from the database on their first search and
+    dropped whenever this process writes one of their bucketlists or
+    items. A build that a write overtakes is returned to its search but
+    not kept. Writes made by other processes are not seen, so indexes are
+    only kept with SEARCH_INDEX_CACHE, which gunicorn_config.py turns off
+    for more than one worker; without it every search builds its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # user id -> (token -> set of documents, sorted tokens)
+        self._users = {}
+        # bucketlist id -> owner, for the users that have an index
+        self._owners = {}
+        # user id -> number of times their index was dropped, and the
+        # number of writes to bucketlists of no known owner, which may
+        # belong to any user whose index is being built
+        self._generations = {}
+        self._unowned_generation = 0
+
+    def _generation(self, user_id):
+        return self._generations.get(user_id, 0), self._unowned_generation
+
+    def forget_user(self, user_id):
+        """Drops a user's index so that it is rebuilt on the next search."""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            if self._users.pop(user_id, None) is not None:
+                for bucketlist_id, owner in list(self._owners.items()):
+                    if owner == user_id:
+                        del self._owners[bucketlist_id]
+
+    def forget_bucketlist(self, bucketlist_id):
+        """Drops the index of the user owning a bucketlist, if built."""
+        owner = self._owners.get(bucketlist_id)
+        if owner is not None:
+            self.forget_user(owner)
+        else:
+            with self._lock:
+                self._unowned_generation += 1
+
+    def _build(self, user_id, keep=True):
+        with self._lock:
+            generation = self._generation(user_id)
+        postings = {}
+
+        def add(document, bucketlist_id, weight, text):
+            for token in set(tokenize(text)):
+                postings.setdefault(token, set()).add(
+                    (document, bucketlist_id, weight))
+
+        owners = {}
+        for bucketlist_id, name in db.session.query(
+                BucketList.id, BucketList.name).filter_by(created_by=user_id):
+            owners[bucketlist_id] = user_id
+            add(('bucketlist', bucketlist_id), bucketlist_id, 1.0, name)
+        for item_id, bucketlist_id, name in db.session.query(
+                BucketListItem.id, BucketListItem.bucketlist_id,
+                BucketListItem.name).join(
+                BucketList, BucketList.id == BucketListItem.bucketlist_id).filter(
+                BucketList.created_by == user_id):
+            add(('item', item_id), bucketlist_id, ITEM_WEIGHT, name)
+
+        index = (postings, sorted(postings))
+        with self._lock:
+            if keep and self._generation(user_id) == generation:
+                self._users[user_id] = index
+                self._owners.update(owners)
+        return index
+
+    def search(self, user_id, terms, limit, offset, keep=True):
+        index = keep and self._users.get(user_id) or self._build(user_id, keep)
+        postings, tokens = index
+
+        matches = None
+        for term in terms:
+            # every term is matched as a prefix so that "ski" finds "Skiing"
+            term_matches = set()
+            position = bisect.bisect_left(tokens, term)
+            while position < len(tokens) and tokens[position].startswith(term):
+                term_matches.update(postings[tokens[position]])
+                position += 1
+            matches = term_matches if matches is None else matches & term_matches
+
+        ranks = {}
+        for document, bucketlist_id, weight in matches or ():
+            ranks[bucketlist_id] = ranks.get(bucketlist_id, 0) + weight
+        ranked = sorted(ranks, key=lambda key: (-ranks[key], key))
+        return SearchPage(ranked[offset:offset + limit],
+                          len(ranked) > offset + limit)
+
+
+postgres_search = PostgresSearch()
+inverted_index = InvertedIndex()
+
+
+@event.listens_for(User, 'after_insert')
+def _user_created(mapper, connection, user):
+    # ids may be reused once rows are gone, so never trust an older index
+    unit_of_work.on_commit(inverted_index.forget_user, user.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, user):
+    # the database deletes the user's bucketlists, which fire no events
+    unit_of_work.on_commit(inverted_index.forget_user, user.id)
+
+
+@event.listens_for(BucketList, 'after_insert')
+@event.listens_for(BucketList, 'after_update')
+@event.listens_for(BucketList, 'after_delete')
+def _bucketlist_written(mapper, connection, bucketlist):
+    unit_of_work.on_commit(inverted_index.forget_user, bucketlist.created_by)
+
+
+@event.listens_for(BucketListItem, 'after_insert')
+@event.listens_for(BucketListItem, 'after_update')
+@event.listens_for(BucketListItem, 'after_delete')
+def _item_written(mapper, connection, item):
+    unit_of_work.on_commit(inverted_index.forget_bucketlist, item.bucketlist_id)
+
+
+def search_bucketlists(user_id, text, limit, offset=0):
+    """Finds a user's bucketlists whose name, or the name of one of their
+    items, contains every term of the search text.
+    :param user_id: An integer identifier of the bucketlists' owner.
+    :param text: The raw search text.
+    :param limit: The number of bucketlists per page.
+    :param offset: The number of best matches to skip.
+    """
+    terms = tokenize(text)
+    if not terms:
+        return SearchPage([], False)
+    if db.engine.dialect.name == 'postgresql':
+        return postgres_search.search(user_id, terms, limit, offset)
+    return inverted_index.search(
+        user_id, terms, limit, offset,
+        current_app.config.get('SEARCH_INDEX_CACHE', True))
@@ -0,0 +1,161 @@
+from collections import OrderedDict
+
+from app.models import BucketList, BucketListItem
+
+# the columns read endpoints select. Querying them with with_entities
+# returns plain rows, skipping the identity map and attribute
+# instrumentation that full ORM objects pay for.
+BUCKETLIST_COLUMNS = (BucketList.id, BucketList.name, BucketList.date_created,
+                      BucketList.date_modified, BucketList.created_by,
+                      BucketList.item_count, BucketList.done_count)
+ITEM_COLUMNS = (BucketListItem.id, BucketListItem.name,
+                BucketListItem.date_created, BucketListItem.date_modified,
+                BucketListItem.bucketlist_id, BucketListItem.done)
+
+
+# the bucketlist fields a listing can be narrowed down to with ?fields=,
+# and the collections it can embed with ?include=
+BUCKETLIST_FIELDS = OrderedDict(
+    (column.key, column) for column in BUCKETLIST_COLUMNS)
+INCLUDES = ('items',)
+
+
+class InvalidFieldset(ValueError):
+    """Raised when a listing asks for fields or includes that do not exist."""
+
+
+class Fieldset(object):
+    """What a listing returns of every bucketlist: some or all of the
+    BUCKETLIST_FIELDS, and the items or not. Only the columns asked for
+    are selected, and leaving the items out skips their query.
+    """
+
+    def __init__(self, fields=None, include=()):
+        """
+        :param fields: The names of the fields, all of them if None. The id
+        is always returned, pages and items are found by it.
+        :param include: The names of the collections to embed.
+        """
+        unknown = [name for name in fields or ()
+                   if name not in BUCKETLIST_FIELDS]
+        if unknown:
+            raise InvalidFieldset("Unknown fields: {}.".format(
+                ", ".join(unknown)))
+        unknown = [name for name in include if name not in INCLUDES]
+        if unknown:
+            raise InvalidFieldset("Cannot include: {}.".format(
+                ", ".join(unknown)))
+        self.fields = ['id'] + [name for name in BUCKETLIST_FIELDS
+                                if name != 'id' and (fields is None or
+                                                     name in fields)]
+        self.items = 'items' in include
+
+    @classmethod
+    def from_args(cls, args):
+        """Builds the fieldset of the `fields` and `include` query arguments,
+        both comma separated. Without either the listing keeps its full
+        form, items included."""
+        fields, include = args.get('fields'), args.get('include')
+        if fields is None and include is None:
+            return cls(include=INCLUDES)
+
+        def names(value):
+            return [name.strip() for name in (value or '').split(',')
+                    if name.strip()]
+        return cls(names(fields) if fields is not None else None,
+                   names(include))
+
+    def columns(self):
+        return [BUCKETLIST_FIELDS[name] for name in self.fields]
+
+    def data(self, row, items=None):
+        """Returns the dict of a row of the fieldset's columns."""
+        data = dict((name, getattr(row, name)) for name in self.fields)
+        if items is not None:
+            data['items'] = items
+        return data
+
+
+def bucketlist_data(bucketlist, items=None):
+    """Returns the dict representing a bucketlist.
+    :param bucketlist: A BucketList or a row of BUCKETLIST_COLUMNS.
+    :param items: The dicts of the bucketlist's items, left out if None.
+    """
+    data = {
+        'id': bucketlist.id,
+        'name': bucketlist.name,
+        'date_created': bucketlist.date_created,
+        'date_modified': bucketlist.date_modified,
+        'created_by': bucketlist.created_by,
+        'item_count': bucketlist.item_count,
+        'done_count': bucketlist.done_count
+    }
+    if items is not None:
+        data['items'] = items
+    return data
+
+
+def item_data(item):
+    """Returns the dict representing an item inside its bucketlist.
+    :param item: A BucketListItem or a row of ITEM_COLUMNS.
+    """
+    return {
+        'id': item.id,
+        'name': item.name,
+        'date_created': item.date_created,
+        'date_modified': item.date_modified,
+        'done': item.done
+    }
+
+
+def full_item_data(item, created_by=None):
+    """Returns the dict representing an item on its own, which also names
+    its bucketlist and, when given, its author."""
+    data = item_data(item)
+    data['bucketlist_id'] = item.bucketlist_id
+    if created_by is not None:
+        data['created_by'] = created_by
+    return data
+
+
+def bucketlist_rows(query, fieldset=None):
+    """Narrows a BucketList query down to BUCKETLIST_COLUMNS, or to the
+    columns of a Fieldset."""
+    if fieldset is not None:
+        return query.with_entities(*fieldset.columns())
+    return query.with_entities(*BUCKETLIST_COLUMNS)
+
+
+def item_rows(bucketlist_id):
+    """Returns a query of the ITEM_COLUMNS of a bucketlist's items."""
+    return BucketListItem.query.with_entities(*ITEM_COLUMNS).filter(
+        BucketListItem.bucketlist_id == bucketlist_id).order_by(
+        BucketListItem.id)
+
+
+def items_by_bucketlist(bucketlist_ids):
+    """Fetches the items of many bucketlists with a single query.
+    :return: A dict of bucketlist id to the list of its item dicts.
+    """
+    items = dict((bucketlist_id, []) for bucketlist_id in bucketlist_ids)
+    if items:
+        rows = BucketListItem.query.with_entities(*ITEM_COLUMNS).filter(
+            BucketListItem.bucketlist_id.in_(items)).order_by(
+            BucketListItem.bucketlist_id, BucketListItem.id)
+        for row in rows:
+            items[row.bucketlist_id].append(item_data(row))
+    return items
+
+
+def bucketlists_data(rows, fieldset=None):
+    """Returns the dicts of a page of bucketlists with their items, using one
+    query for the items of the whole page.
+    :param rows: Rows of BUCKETLIST_COLUMNS, in the order to keep.
+    :param fieldset: A Fieldset the rows were selected with, if any; its
+    items are fetched only when it includes them.
+    """
+    fieldset = fieldset or Fieldset(include=INCLUDES)
+    if not fieldset.items:
+        return [fieldset.data(row) for row in rows]
+    items = items_by_bucketlist([row.id for row in rows])
+    return [fieldset.data(row, items[row.id]) for row in rows]
@@ -0,0 +1,46 @@
+from flask import Response, stream_with_context
+
+from app.encoders import encoder
+
+
+def _json_array(rows, serialize, batch_size):
+    """Yields the JSON text of an array chunk by chunk, so that no more than
+    batch_size serialized rows are held in memory at once.
+    :param rows: An iterable of rows, ideally a query using yield_per.
+    :param serialize: A function turning a row into a JSON serializable dict.
+    :param batch_size: The number of rows written per chunk.
+    """
+    chunk = ["["]
+    separator = ""
+    for count, row in enumerate(rows, 1):
+        chunk.append(separator + encoder.dumps(serialize(row)))
+        separator = ","
+        if count % batch_size == 0:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
+
+
+def stream_array(rows, serialize, batch_size):
+    """Returns a response streaming rows as a JSON array."""
+    return Response(stream_with_context(_json_array(rows, serialize, batch_size)),
+                    mimetype="application/json")
+
+
+def stream_object(fields, key, rows, serialize, batch_size):
+    """Returns a response streaming a JSON object made of fields plus an
+    array of rows under key.
+    :param fields: A dict of the object's other members, written up front.
+    :param key: The name of the member holding the streamed array.
+    """
+    def generate():
+        head = encoder.dumps(fields)[:-1]
+        if fields:
+            head += ", "
+        yield head + encoder.dumps(key) + ": "
+        for chunk in _json_array(rows, serialize, batch_size):
+            yield chunk
+        yield "}"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache(object):
+    """A bounded LRU cache of tokens that have already been verified.
+    Entries are dropped no later than their token's own expiry, so a hit
+    is exactly as trustworthy as decoding the token again.
+    """
+
+    def __init__(self, maxsize=1024):
+        """
+        :param maxsize: The number of tokens to keep, 0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Sizes the cache from the TOKEN_CACHE_SIZE setting of an app."""
+        self.maxsize = app.config.get('TOKEN_CACHE_SIZE', self.maxsize)
+        self.clear()
+
+    def get(self, token):
+        """Returns the user id a token was verified for, or None."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def set(self, token, user_id, expires):
+        """Remembers a verified token.
+        :param token: The raw token string from the Authorization header.
+        :param user_id: The user id the token was issued for.
+        :param expires: The token's expiry as a POSIX timestamp.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user_id, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        """Returns the hit and miss counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+
+token_cache = TokenCache()
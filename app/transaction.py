@@ -0,0 +1,87 @@
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+
+
+class UnitOfWork(object):
+    """Gives every request a single database transaction.
+
+    Inside a request, commit() only flushes, so that ids and defaults are
+    assigned, and the transaction is committed once after the view has
+    returned a response below 400. Any other response, or an exception,
+    rolls it back. Outside a request, e.g. in scripts and tests, commit()
+    commits straight away.
+    """
+
+    def init_app(self, app):
+        app.after_request(self._end_request)
+        app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def deferred():
+        """Tells whether commits are left to the end of the current request."""
+        return has_request_context() and not g.get('transaction_ended', False)
+
+    def commit(self):
+        """Commits the session, or flushes it when the current request will
+        commit it."""
+        if self.deferred():
+            g.transaction_pending = True
+            db.session.flush()
+        else:
+            db.session.commit()
+
+    def flush(self):
+        """Sends pending changes to the database without committing them,
+        e.g. to read back generated ids."""
+        if self.deferred():
+            g.transaction_pending = True
+        db.session.flush()
+
+    @staticmethod
+    def commit_now():
+        """Commits immediately, even inside a request. Meant for the rare
+        writes that must be visible before the request ends."""
+        db.session.commit()
+
+    @staticmethod
+    def on_commit(callback, *args):
+        """Calls callback(*args) once the current transaction is committed,
+        and never if it is rolled back. Used for side effects such as cache
+        invalidation, which must not happen before the data is visible."""
+        db.session().info.setdefault('on_commit', []).append((callback, args))
+
+    @staticmethod
+    def _end_request(response):
+        if g.pop('transaction_pending', False):
+            try:
+                if response.status_code < 400:
+                    db.session.commit()
+                else:
+                    db.session.rollback()
+            except Exception:
+                db.session.rollback()
+                raise
+        g.transaction_ended = True
+        return response
+
+    @staticmethod
+    def _teardown_request(exception):
+        if exception is not None:
+            db.session.rollback()
+
+
+unit_of_work = UnitOfWork()
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_commit_callbacks(session):
+    for callback, args in session.info.pop('on_commit', []):
+        callback(*args)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_commit_callbacks(session, previous_transaction):
+    session.info.pop('on_commit', None)
@@ -1,17 +1,55 @@
-from flask import request, jsonify, abort, make_response, render_template
+from flask import (Blueprint, request, abort, make_response, render_template,
+                   url_for, current_app, json, Response, stream_with_context)
+
+from app.models import BucketList, BucketListItem, user_changed
+from .auth_wrapper import evaluate_auth, metrics_auth
+from .cache import response_cache
+from .encoders import encoder, jsonify
+from .conditional import (bucketlist_validators, item_validators,
+                          items_validators, listing_validators)
+from .metrics import metrics
+from .pagination import InvalidCursor, page_number, page_size, paginate_by_key
+from .pool import pool_stats
+from .search import inverted_index, search_bucketlists
+from .serializers import (Fieldset, InvalidFieldset, bucketlist_data,
+                          bucketlist_rows, bucketlists_data, full_item_data,
+                          item_data, item_rows)
+from .streaming import stream_array, stream_object
+from .transaction import unit_of_work
+from . import db
+
+# the API's routes, registered on every app create_app builds
+api = Blueprint('api', __name__)
+
+
+@api.route('/', methods=['GET'])
+def index():
+    return render_template('index.html')
 
-from app.models import BucketList, BucketListItem
-from .auth_wrapper import evaluate_auth
-from . import app
 
+@api.route('/metrics/pool', methods=['GET'])
+@metrics_auth
+def pool_metrics():
+    """Reports the database connection pool of the worker serving the
+    request; scrape every worker, e.g. through their own ports, for the
+    full picture."""
+    return make_response(jsonify(pool_stats(db.engine))), 200
 
-@app.route('/', methods=['GET'])
-def index():
-    return render_template('index.html')
+
+@api.route('/metrics', methods=['GET'])
+@metrics_auth
+def request_metrics():
+    """Reports per-route latency and SQL metrics in Prometheus' text format,
+    for every worker sharing the METRICS_DIR."""
+    if not metrics.enabled:
+        return make_response(jsonify({"message": "Metrics are disabled"})), 404
+    return current_app.response_class(
+        metrics.render(), content_type='text/plain; version=0.0.4')
 
 
-@app.route('/api/v1/bucketlists/', methods=['POST', 'GET'])
+@api.route('/api/v1/bucketlists/', methods=['POST', 'GET'])
 @evaluate_auth
+@response_cache.cached
 def bucketlists(user_id):
     """A view for the creation and  retrieval of a database.
     :param user_id: An integer representing the creator/owner of bucketlist.
@@ -23,14 +61,7 @@ def bucketlists(user_id):
             if not bucketlist:
                 bucketlist = BucketList(name=name, created_by=user_id)
                 bucketlist.save()
-                response = {
-                    'id': bucketlist.id,
-                    'name': bucketlist.name,
-                    'date_created': bucketlist.date_created,
-                    'date_modified': bucketlist.date_modified,
-                    'items': [],
-                    'created_by': user_id
-                }
+                response = bucketlist_data(bucketlist, items=[])
                 return make_response(jsonify({"bucketlists": response})), 201
             else:
                 res = {
@@ -39,36 +70,56 @@ def bucketlists(user_id):
                 return make_response(jsonify(res)), 200
     else:
         # GET
+        try:
+            fieldset = Fieldset.from_args(request.args)
+        except InvalidFieldset as e:
+            res = {
+                "message": str(e)
+            }
+            return make_response(jsonify(res)), 400
+        # carried over to the links of the other pages
+        sparse = dict((name, request.args[name])
+                      for name in ("fields", "include") if name in request.args)
+        validators = listing_validators(user_id)
+        if validators.is_fresh():
+            return validators.not_modified()
         search = str(request.args.get("q", ""))
         if search:
-            search_query = BucketList.query.filter_by(created_by=user_id).filter(
-                BucketList.name.ilike('%'+search+'%')).all()
-            if search_query:
-                search_results = []
-                for bucketlist in search_query:
-                    items = BucketListItem.query.filter_by(
-                        bucketlist_id=bucketlist.id)
-                    items_list = []
-                    for item in items:
-                        item_data = {"id": item.id,
-                                     "name": item.name,
-                                     "date_created": item.date_created,
-                                     "date_modified": item.date_modified,
-                                     "done": item.done
-                                     }
-                        items_list.append(item_data)
-
-                    bucketlist_data = {
-                        'id': bucketlist.id,
-                        'name': bucketlist.name,
-                        'date_created': bucketlist.date_created,
-                        'date_modified': bucketlist.date_modified,
-                        'items': items_list,
-                        'created_by': bucketlist.created_by
-                    }
-                    search_results.append(bucketlist_data)
-
-                return make_response(jsonify({"bucketlists": search_results})), 200
+            limit = page_size(request.args.get("limit"),
+                              current_app.config["BUCKETLISTS_PER_PAGE"],
+                              current_app.config["MAX_BUCKETLISTS_PER_PAGE"])
+            page = page_number(request.args.get("page"))
+            hits = search_bucketlists(user_id, search, limit, (page - 1) * limit)
+            if hits.bucketlist_ids:
+                # the search engine may hold ids that now belong to another
+                # user, e.g. an index built before a row was deleted and its
+                # id reused, so ownership is checked here as well
+                found = bucketlist_rows(BucketList.query.filter(
+                    BucketList.id.in_(hits.bucketlist_ids),
+                    BucketList.created_by == user_id), fieldset).all()
+                found = dict((row.id, row) for row in found)
+                # keep the ranking order of the search engine
+                search_results = bucketlists_data(
+                    [found[bucketlist_id] for bucketlist_id in hits.bucketlist_ids
+                     if bucketlist_id in found], fieldset)
+
+                if hits.has_next:
+                    next_page = url_for(request.endpoint, q=search,
+                                        page=page + 1, limit=limit, **sparse)
+                else:
+                    next_page = ""
+                if page > 1:
+                    previous_page = url_for(request.endpoint, q=search,
+                                            page=page - 1, limit=limit,
+                                            **sparse)
+                else:
+                    previous_page = ""
+                response = {
+                    "next_page": next_page,
+                    "previous_page": previous_page,
+                    "bucketlists": search_results
+                }
+                return validators.apply(make_response(jsonify(response))), 200
             else:
                 res = {
                     "message": "Specified bucketlist is not available"
@@ -76,67 +127,197 @@ def bucketlists(user_id):
                 return make_response(jsonify(res)), 404
         else:
             # paginate bucketlist results
-            limit = request.args.get("limit")
+            limit = page_size(request.args.get("limit"),
+                              current_app.config["BUCKETLISTS_PER_PAGE"],
+                              current_app.config["MAX_BUCKETLISTS_PER_PAGE"])
+            query = bucketlist_rows(
+                BucketList.query.filter_by(created_by=user_id), fieldset)
+            next_cursor = prev_cursor = ""
             if request.args.get("page"):
-                page = int(request.args.get("page"))
-            else:
-                # Assign page number arbitrarily if none is given
-                page = 1
-            if limit and len(request.args.get("limit")):
-                # use the limit issued with request
-                limit = int(request.args.get("limit"))
-            else:
-                # set limit otherwise
-                limit = 20
-            paginated_results = BucketList.query.filter_by(
-                created_by=user_id).paginate(page, limit, False)
-            if paginated_results.has_next:
-                    next_page = request.endpoint + '?page=' + str(
-                        page + 1) + '&limit=' + str(limit)
-            else:
-                next_page = ""
-            if paginated_results.has_prev:
-                    previous_page = request.endpoint + '?page=' + str(
-                        page - 1) + '&limit=' + str(limit)
+                # offset pagination, kept for clients that still send ?page=
+                page = page_number(request.args.get("page"))
+                paginated_results = query.order_by(BucketList.id).paginate(
+                    page, limit, False)
+                if paginated_results.has_next:
+                    next_page = url_for(request.endpoint, page=page + 1,
+                                        limit=limit, **sparse)
+                else:
+                    next_page = ""
+                if paginated_results.has_prev:
+                    previous_page = url_for(request.endpoint, page=page - 1,
+                                            limit=limit, **sparse)
+                else:
+                    previous_page = ""
             else:
-                previous_page = ""
-
-            paginated_bucketlists = paginated_results.items
-            results = []
-
-            for bucketlist in paginated_bucketlists:
-                items = BucketListItem.query.filter_by(bucketlist_id=bucketlist.id)
-                items_list = []
-                for item in items:
-                    item_data = {"id": item.id,
-                                 "name": item.name,
-                                 "date_created": item.date_created,
-                                 "date_modified": item.date_modified,
-                                 "done": item.done
-                                 }
-                    items_list.append(item_data)
-
-                bucketlist_data = {
-                    'id': bucketlist.id,
-                    'name': bucketlist.name,
-                    'date_created': bucketlist.date_created,
-                    'date_modified': bucketlist.date_modified,
-                    'items': items_list,
-                    'created_by': bucketlist.created_by
-                }
-                results.append(bucketlist_data)
+                try:
+                    paginated_results = paginate_by_key(
+                        query, BucketList.id, limit, request.args.get("cursor"))
+                except InvalidCursor as e:
+                    res = {
+                        "message": str(e)
+                    }
+                    return make_response(jsonify(res)), 400
+                next_cursor = paginated_results.next_cursor or ""
+                prev_cursor = paginated_results.prev_cursor or ""
+                if next_cursor:
+                    next_page = url_for(request.endpoint, cursor=next_cursor,
+                                        limit=limit, **sparse)
+                else:
+                    next_page = ""
+                if prev_cursor:
+                    previous_page = url_for(request.endpoint,
+                                            cursor=prev_cursor, limit=limit,
+                                            **sparse)
+                else:
+                    previous_page = ""
+
+            # the items of the whole page, if asked for, are fetched with a
+            # single query
+            results = bucketlists_data(paginated_results.items, fieldset)
 
             response = {
                         "next_page": next_page,
                         "previous_page": previous_page,
+                        "next_cursor": next_cursor,
+                        "prev_cursor": prev_cursor,
                         "bucketlists": results
                     }
 
-            return make_response(jsonify(response)), 200
+            return validators.apply(make_response(jsonify(response))), 200
 
 
-@app.route('/api/v1/bucketlists/<int:id>', methods=['GET', 'PUT', 'DELETE'])
+@api.route('/api/v1/bucketlists/export', methods=['GET'])
+@evaluate_auth
+def export_bucketlists(user_id):
+    """A view streaming all of a user's bucketlists and items as NDJSON.
+    Each bucketlist line is followed by the lines of its items. Rows are
+    read from a server-side cursor in batches, so memory use does not grow
+    with the amount of data exported.
+    :param user_id: An integer identifier of the bucketlists' owner.
+    """
+    bucketlists_table = BucketList.__table__
+    items_table = BucketListItem.__table__
+    query = db.select([
+        bucketlists_table.c.id, bucketlists_table.c.name,
+        bucketlists_table.c.date_created, bucketlists_table.c.date_modified,
+        items_table.c.id.label("item_id"), items_table.c.name.label("item_name"),
+        items_table.c.date_created.label("item_date_created"),
+        items_table.c.date_modified.label("item_date_modified"),
+        items_table.c.done]).select_from(
+        bucketlists_table.outerjoin(
+            items_table,
+            items_table.c.bucketlist_id == bucketlists_table.c.id)).where(
+        bucketlists_table.c.created_by == user_id).order_by(
+        bucketlists_table.c.id, items_table.c.id).execution_options(
+        stream_results=True)
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+
+    def generate():
+        result = db.session.execute(query)
+        current = None
+        try:
+            rows = result.fetchmany(batch_size)
+            while rows:
+                for row in rows:
+                    if row.id != current:
+                        current = row.id
+                        yield encoder.dumps({
+                            "type": "bucketlist",
+                            "id": row.id,
+                            "name": row.name,
+                            "date_created": row.date_created,
+                            "date_modified": row.date_modified
+                        }) + "\n"
+                    if row.item_id is not None:
+                        yield encoder.dumps({
+                            "type": "item",
+                            "id": row.item_id,
+                            "bucketlist_id": row.id,
+                            "name": row.item_name,
+                            "date_created": row.item_date_created,
+                            "date_modified": row.item_date_modified,
+                            "done": row.done
+                        }) + "\n"
+                rows = result.fetchmany(batch_size)
+        finally:
+            result.close()
+
+    return Response(stream_with_context(generate()),
+                    mimetype="application/x-ndjson")
+
+
+@api.route('/api/v1/bucketlists/import', methods=['POST'])
 @evaluate_auth
+def import_bucketlists(user_id):
+    """A view importing bucketlists and items from an NDJSON upload in the
+    format written by export_bucketlists. Bucketlists are matched to the
+    user's existing ones by name and items are inserted in batches, all
+    in one transaction.
+    :param user_id: An integer identifier of the importing user.
+    """
+    batch_size = current_app.config["IMPORT_BATCH_SIZE"]
+    # exported bucketlist id -> id of the bucketlist receiving its items
+    bucketlist_ids = {}
+    pending_items = []
+    bucketlist_count = item_count = 0
+
+    def rejected(message):
+        # the error status rolls back what was imported so far
+        return make_response(jsonify({"message": message})), 400
+
+    for number, line in enumerate(request.stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line.decode("utf-8"))
+            kind, name = record["type"], record["name"].strip()
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return rejected("Line {} is not a valid record.".format(number))
+        if not name:
+            return rejected("Line {} has no name.".format(number))
+
+        if kind == "bucketlist":
+            bucketlist = BucketList.query.filter_by(
+                name=name, created_by=user_id).first()
+            if not bucketlist:
+                bucketlist = BucketList(name=name, created_by=user_id)
+                db.session.add(bucketlist)
+                unit_of_work.flush()
+            bucketlist_ids[record.get("id")] = bucketlist.id
+            bucketlist_count += 1
+        elif kind == "item" and record.get("bucketlist_id") in bucketlist_ids:
+            try:
+                done = as_done(record.get("done", False))
+            except ValueError as error:
+                return rejected("Line {}: {}".format(number, error))
+            pending_items.append({
+                "name": name,
+                "bucketlist_id": bucketlist_ids[record["bucketlist_id"]],
+                "done": done
+            })
+            item_count += 1
+            if len(pending_items) >= batch_size:
+                BucketListItem.bulk_insert(pending_items)
+                pending_items = []
+        else:
+            return rejected("Line {} is not a bucketlist or an item of an "
+                            "earlier bucketlist.".format(number))
+
+    BucketListItem.bulk_insert(pending_items)
+    user_changed(user_id)
+    unit_of_work.on_commit(inverted_index.forget_user, user_id)
+    unit_of_work.commit()
+    response = {
+        "message": "Import successful.",
+        "bucketlists": bucketlist_count,
+        "items": item_count
+    }
+    return make_response(jsonify(response)), 201
+
+
+@api.route('/api/v1/bucketlists/<int:id>', methods=['GET', 'PUT', 'DELETE'])
+@evaluate_auth
+@response_cache.cached
 def bucketlist_manipulation(id, user_id, *args, **kwargs):
     """A view for the manipulation(retrieval, editing and deleting of a bucketlist.)
     :param id: An integer identifier of the database.
@@ -158,44 +339,26 @@ def bucketlist_manipulation(id, user_id, *args, **kwargs):
         name = str(request.data.get('name', ''))
         bucketlist.name = name
         bucketlist.save()
-        response = jsonify({
-            'id': bucketlist.id,
-            'name': bucketlist.name,
-            'date_created': bucketlist.date_created,
-            'date_modified': bucketlist.date_modified,
-            'created_by': bucketlist.created_by
-        })
+        response = jsonify(bucketlist_data(bucketlist))
         response.status_code = 201
         return response
     else:
         # GET
-        items = BucketListItem.query.filter_by(bucketlist_id=id)
-        bucketlist_items = []
-        for item in items:
-            data = {
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "done": item.done
-            }
-            bucketlist_items.append(data)
-
-        response = jsonify({
-            'id': bucketlist.id,
-            'name': bucketlist.name,
-            'date_created': bucketlist.date_created,
-            'date_modified': bucketlist.date_modified,
-            'created_by': bucketlist.created_by,
-            'items': bucketlist_items
-
-        })
+        validators = bucketlist_validators(bucketlist)
+        if validators.is_fresh():
+            return validators.not_modified()
+        batch_size = current_app.config["STREAM_BATCH_SIZE"]
+        # items are fetched and written batch by batch
+        items = item_rows(id).yield_per(batch_size)
+        response = stream_object(bucketlist_data(bucketlist), 'items', items,
+                                 item_data, batch_size)
         response.status_code = 200
-        return response
+        return validators.apply(response)
 
 
-@app.route('/api/v1/bucketlists/<int:id>/items/', methods=['GET', 'POST'])
+@api.route('/api/v1/bucketlists/<int:id>/items/', methods=['GET', 'POST'])
 @evaluate_auth
+@response_cache.cached
 def bucketlist_items(id, user_id, *args, **kwargs):
     """A view for the creation and retrieval of bucketlist items
     :param id: A unique integer identifier for the bucketlist item.
@@ -207,39 +370,140 @@ def bucketlist_items(id, user_id, *args, **kwargs):
         abort(jsonify({"message": "Bucketlist does not exist."}))
 
     if request.method == 'GET':
-        items = BucketListItem.query.filter_by(bucketlist_id=id)
-        results = []
-
-        for item in items:
-            data = {
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "bucketlist_id": item.bucketlist_id,
-                "done": item.done
-            }
-            results.append(data)
-        return make_response(jsonify(results)), 200
+        validators = items_validators(bucketlist)
+        if validators.is_fresh():
+            return validators.not_modified()
+        batch_size = current_app.config["STREAM_BATCH_SIZE"]
+        # items are fetched and written batch by batch
+        items = item_rows(id).yield_per(batch_size)
+        response = stream_array(items, full_item_data, batch_size)
+        return validators.apply(response), 200
     elif request.method == 'POST':
+        if isinstance(request.data, list):
+            return create_items(bucketlist, user_id, request.data)
         name = str(request.data.get("name", ""))
         if name:
             item = BucketListItem(name=name, bucketlist_id=id)
             item.save()
-            response = jsonify({
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "bucketlist_id": item.bucketlist_id,
-                "done": item.done,
-                "created_by": user_id
-                })
+            response = jsonify(full_item_data(item, created_by=user_id))
             return make_response(response), 201
 
 
-@app.route('/api/v1/bucketlists/<int:id>/items/<int:item_id>', methods=['GET', 'PUT', 'DELETE'])
+def create_items(bucketlist, user_id, items):
+    """Creates every item of a JSON array in one transaction.
+    :param bucketlist: The bucketlist receiving the items.
+    :param user_id: A unique integer identifier for the items' author.
+    :param items: A list of objects each holding an item's name.
+    """
+    max_items = current_app.config["MAX_BULK_ITEMS"]
+    if len(items) > max_items:
+        res = {
+            "message": "Cannot create more than {} items at once.".format(
+                max_items)
+        }
+        return make_response(jsonify(res)), 413
+
+    names = []
+    for item in items:
+        name = item.get("name") if isinstance(item, dict) else None
+        if not isinstance(name, str) or not name.strip():
+            res = {
+                "message": "Every item needs a name."
+            }
+            return make_response(jsonify(res)), 400
+        names.append(name)
+    if not names:
+        res = {
+            "message": "No items to create."
+        }
+        return make_response(jsonify(res)), 400
+
+    created = BucketListItem.bulk_create(bucketlist.id, names)
+    unit_of_work.on_commit(inverted_index.forget_user, user_id)
+    results = [full_item_data(item, created_by=user_id) for item in created]
+    return make_response(jsonify({"items": results})), 201
+
+
+# the strings accepted for a done status, besides JSON booleans
+DONE_VALUES = {"true": True, "t": True, "yes": True, "on": True, "1": True,
+               "false": False, "f": False, "no": False, "off": False,
+               "0": False}
+
+
+def as_done(value):
+    """Reads a done status sent as a JSON boolean or as one of the strings
+    of DONE_VALUES. Anything else raises a ValueError, rather than
+    silently meaning False."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in DONE_VALUES:
+        return DONE_VALUES[value.strip().lower()]
+    raise ValueError("done must be true or false.")
+
+
+@api.route('/api/v1/bucketlists/<int:id>/items/', methods=['PATCH'])
 @evaluate_auth
+def bulk_update_items(id, user_id, *args, **kwargs):
+    """A view setting done, and optionally the name, of many items of a
+    bucketlist at once: all of them, those listed in "ids", or those
+    matching "filter" ({"done": ..., "name": ...}).
+    :param id: A unique integer identifier for the bucketlist.
+    :param user_id: A unique integer identifier for the bucketlist's owner.
+    """
+    def rejected(message, status=400):
+        return make_response(jsonify({"message": message})), status
+
+    data = request.data if isinstance(request.data, dict) else {}
+    done = data.get("done")
+    name = data.get("name")
+    if name is not None and (not isinstance(name, str) or not name.strip()):
+        return rejected("An item needs a name.")
+    if done is None and name is None:
+        return rejected("Nothing to update, send done or name.")
+
+    ids = data.get("ids")
+    if ids is not None:
+        if not isinstance(ids, list) or not all(
+                isinstance(item_id, int) and not isinstance(item_id, bool)
+                for item_id in ids):
+            return rejected("ids must be a list of item ids.")
+        max_items = current_app.config["MAX_BULK_ITEMS"]
+        if len(ids) > max_items:
+            return rejected("Cannot update more than {} listed items at "
+                            "once.".format(max_items), 413)
+    filters = data.get("filter") or {}
+    if not isinstance(filters, dict) or set(filters) - {"done", "name"}:
+        return rejected("filter takes done and name only.")
+    if not isinstance(filters.get("name", ""), str):
+        return rejected("filter name must be a string.")
+    try:
+        done = as_done(done) if done is not None else None
+        done_filter = (as_done(filters["done"]) if "done" in filters
+                       else None)
+    except ValueError as e:
+        return rejected(str(e))
+
+    updated, date_modified = BucketListItem.bulk_update(
+        id, user_id, done=done,
+        name=name, ids=ids, done_filter=done_filter,
+        name_filter=filters.get("name", ""))
+    if not updated and not BucketList.query.filter_by(
+            id=id, created_by=user_id).count():
+        # the UPDATE matched nothing, tell a foreign bucketlist from one
+        # already up to date
+        return rejected("Bucketlist does not exist.", 404)
+    if updated and name is not None:
+        unit_of_work.on_commit(inverted_index.forget_user, user_id)
+    response = {
+        "updated": updated,
+        "date_modified": date_modified
+    }
+    return make_response(jsonify(response)), 200
+
+
+@api.route('/api/v1/bucketlists/<int:id>/items/<int:item_id>', methods=['GET', 'PUT', 'DELETE'])
+@evaluate_auth
+@response_cache.cached
 def bucketlist_item_manipulation(id, item_id, user_id, *atgs, **kwargs):
     """A view for the manipulation(retrieval, updating and deletion of bucketlist item).
     :param id: A unique integer identifier for the bucketlist item.
@@ -263,48 +527,31 @@ def bucketlist_item_manipulation(id, item_id, user_id, *atgs, **kwargs):
 
     elif request.method == "PUT":
         name = str(request.data.get("name", ""))
-        done = str(request.data.get("done", ""))
+        done = request.data.get("done", "")
         if name:
             item.name = name
             item.save()
-            response = jsonify({
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "bucketlist_id": item.bucketlist_id,
-                "created_by": user_id,
-                "done": item.done})
+            response = jsonify(full_item_data(item, created_by=user_id))
 
             return make_response(response), 201
 
-        elif done:
-            item.done = done
+        elif done != "":
+            try:
+                item.done = as_done(done)
+            except ValueError as e:
+                res = {
+                    "message": str(e)
+                }
+                return make_response(jsonify(res)), 400
             item.save()
-            response = jsonify({
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "bucketlist_id": item.bucketlist_id,
-                "created_by": user_id,
-                "done": item.done})
+            response = jsonify(full_item_data(item, created_by=user_id))
 
             return make_response(response), 200
 
     elif request.method == "GET":
-        all_items = BucketListItem.query.filter_by(id=item_id)
-        results = []
-
-        for item in all_items:
-            obj = {
-                "id": item.id,
-                "name": item.name,
-                "date_created": item.date_created,
-                "date_modified": item.date_modified,
-                "bucketlist_id": item.bucketlist_id,
-                "done": item.done
-            }
-            results.append(obj)
+        validators = item_validators(item)
+        if validators.is_fresh():
+            return validators.not_modified()
+        results = [full_item_data(item)]
 
-        return make_response(jsonify(results)), 200
+        return validators.apply(make_response(jsonify(results))), 200
@@ -0,0 +1,39 @@
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+from app import db
+from app.models import User, BucketList
+from app.serializers import bucketlist_rows, item_rows, items_by_bucketlist
+
+
+def dispose_engines(app):
+    """Closes the pooled connections of every engine of the app, so that
+    none is shared by the processes of a fork."""
+    with app.app_context():
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or {}):
+            db.get_engine(app, bind).dispose()
+
+
+def warm_up(app, connections=None):
+    """Does the work a worker would otherwise do on its first requests:
+    configures the mappers, opens pooled connections and compiles the
+    statements of the busiest routes.
+    :param connections: How many connections to open, by default the
+    pool size.
+    """
+    configure_mappers()
+    with app.app_context():
+        engine = db.engine
+        if isinstance(engine.pool, QueuePool):
+            if connections is None:
+                connections = engine.pool.size()
+            opened = [engine.connect() for _ in range(connections)]
+            for connection in opened:
+                connection.close()
+        # ids below 1 match no rows, the statements are still compiled and
+        # their result processors set up
+        User.query.filter_by(username='').first()
+        bucketlist_rows(BucketList.query.filter_by(created_by=0)).limit(1).all()
+        items_by_bucketlist([0])
+        item_rows(0).all()
+        db.session.remove()
@@ -0,0 +1,124 @@
+"""Compares one sync worker with one gevent worker (run_async.py) serving
+listing requests while every query takes --delay seconds, as it would on
+a busy or distant database.
+
+    python -m benchmarks.bench_async --requests 200 --concurrency 20 \
+        --delay 0.02
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+from benchmarks.common import database_url
+
+
+def serve(mode, port, delay):
+    """Runs in the server process."""
+    if mode == 'gevent':
+        # patches the standard library before anything else is imported
+        from run_async import app
+    else:
+        from run import app
+    from app import db
+    from app.cache import response_cache
+    from sqlalchemy import event
+
+    # every request must be answered from the database
+    app.config['RESPONSE_CACHE_BACKEND'] = None
+    response_cache.init_app(app)
+    with app.app_context():
+        db.create_all()
+        engine = db.engine
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def slow_query(*args):
+        # gevent turns this into a cooperative sleep
+        time.sleep(delay)
+
+    if mode == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(('127.0.0.1', port), app, log=None).serve_forever()
+    else:
+        from werkzeug.serving import run_simple
+        run_simple('127.0.0.1', port, app, threaded=False)
+
+
+def call(port, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = token
+    request = Request('http://127.0.0.1:{}{}'.format(port, path), method=method,
+                      headers=headers,
+                      data=json.dumps(body).encode() if body else None)
+    with urlopen(request, timeout=120) as response:
+        return json.loads(response.read().decode())
+
+
+def measure(mode, args):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, APP_SETTINGS='staging', DATABASE_URL=database_url(),
+               PASSWORD_HASH_WORKERS='0')
+    env.setdefault('SECRET_KEY', 'benchmark-secret')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.bench_async', '--serve', mode,
+         '--port', str(port), '--delay', str(args.delay)], env=env,
+        stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                socket.create_connection(('127.0.0.1', port), 1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        user = {'username': 'bench', 'password': 'bench-password',
+                'email': 'bench@example.com'}
+        call(port, 'POST', '/auth/register/', user)
+        token = call(port, 'POST', '/auth/login/', user)['token']
+        call(port, 'POST', '/api/v1/bucketlists/', {'name': 'bench'}, token)
+
+        def listing(_):
+            start = time.time()
+            call(port, 'GET', '/api/v1/bucketlists/', token=token)
+            return time.time() - start
+
+        start = time.time()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            latencies = sorted(pool.map(listing, range(args.requests)))
+        elapsed = time.time() - start
+    finally:
+        server.terminate()
+        server.wait()
+    print('{:7} {:7.1f} requests/s  p50 {:7.1f}ms  p95 {:7.1f}ms'.format(
+        mode, args.requests / elapsed,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.95) - 1] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--delay', type=float, default=0.02,
+                        help='seconds added to every query')
+    parser.add_argument('--serve', choices=('sync', 'gevent'),
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.delay)
+        return
+    for mode in ('sync', 'gevent'):
+        measure(mode, args)
+
+
+if __name__ == '__main__':
+    main()
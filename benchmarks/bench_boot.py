@@ -0,0 +1,86 @@
+"""Measures gunicorn's boot time and per-worker memory with and without
+preloading the app in the master, using gunicorn_config.py.
+
+    python -m benchmarks.bench_boot --workers 4
+
+Boot time runs until every worker has answered a request. Memory is read
+from /proc (Linux only): RSS counts pages shared with the master, the
+private size is what each extra worker really costs.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from urllib.request import Request, urlopen
+
+from benchmarks.common import bench_app
+
+# lets the benchmark ask every worker for its pid at /metrics/pool
+METRICS_TOKEN = 'bench-metrics-token'
+
+
+def memory(pid):
+    """Returns the RSS and private memory of a process, in KiB."""
+    sizes = {}
+    with open('/proc/{}/smaps_rollup'.format(pid)) as rollup:
+        for line in rollup:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                sizes[parts[0].rstrip(':')] = int(parts[1])
+    return sizes['Rss'], sizes['Private_Clean'] + sizes['Private_Dirty']
+
+
+def boot(preload, args, database_url):
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, APP_SETTINGS='staging', DATABASE_URL=database_url,
+               PORT=str(port), WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_PRELOAD='1' if preload else '0',
+               PASSWORD_HASH_WORKERS='0', METRICS_TOKEN=METRICS_TOKEN)
+    start = time.time()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py',
+         '--bind', '127.0.0.1:{}'.format(port)], env=env,
+        stderr=subprocess.DEVNULL)
+    try:
+        pids = set()
+        while len(pids) < args.workers:
+            if time.time() - start > args.timeout:
+                raise RuntimeError('gunicorn did not boot in time')
+            try:
+                with urlopen(Request(
+                        'http://127.0.0.1:{}/metrics/pool'.format(port),
+                        headers={'Authorization': 'Bearer ' + METRICS_TOKEN}),
+                        timeout=5) as response:
+                    pids.add(json.loads(response.read().decode())['pid'])
+            except OSError:
+                time.sleep(0.01)
+        elapsed = time.time() - start
+        sizes = [memory(pid) for pid in pids]
+    finally:
+        server.terminate()
+        server.wait()
+    print('preload {:3}: all {} workers up in {:6.2f}s, per worker RSS '
+          '{:7.0f}KiB, private {:7.0f}KiB'.format(
+              'on' if preload else 'off', args.workers, elapsed,
+              sum(size[0] for size in sizes) / len(sizes),
+              sum(size[1] for size in sizes) / len(sizes)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    database_url = bench_app().config['SQLALCHEMY_DATABASE_URI']
+    for preload in (False, True):
+        boot(preload, args, database_url)
+
+
+if __name__ == '__main__':
+    main()
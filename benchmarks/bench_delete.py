@@ -0,0 +1,61 @@
+"""Times deleting a bucketlist of many items, left to ON DELETE CASCADE,
+against the session loading the items and deleting them row by row as it
+did before the relationships were made passive.
+
+    python -m benchmarks.bench_delete --items 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from sqlalchemy import event
+
+from benchmarks.common import bench_app
+from benchmarks.seed import seed
+
+
+def delete(load_items):
+    """Deletes the seeded bucketlist, returning the seconds, statements and
+    peak memory it took."""
+    from app import db
+    from app.models import BucketList, BucketListItem
+
+    db.session.remove()
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        bucketlist = BucketList.query.one()
+        if load_items:
+            bucketlist.items
+        bucketlist.delete()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        event.remove(db.engine, 'before_cursor_execute', count_statement)
+    assert BucketListItem.query.count() == 0
+    return elapsed, len(statements), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100000)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        for label, load_items in (('cascade', False), ('loaded', True)):
+            seed(1, 1, args.items)
+            elapsed, statements, peak = delete(load_items)
+            print('{:8} {:9.1f}ms {:7} statements {:8.1f}MiB peak'.format(
+                label, elapsed * 1000, statements, peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Reports what a cold start costs: a fresh interpreter importing the app,
+create_app building it and the first request being answered, checked
+against a budget for serverless and autoscaled deployments, where every
+new instance pays it before serving.
+
+    python -m benchmarks.bench_import --budget 750 --top 15
+
+The import breakdown comes from `python -X importtime`, summed per
+top-level package. Modules only the CLI or another server needs must not
+show up at all. Exits with status 1 when over budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from benchmarks.common import database_url
+
+# cold start target in milliseconds, from interpreter start to first response
+BUDGET = 750
+# imported by manage.py or run_async.py only, never by the app itself
+NOT_AT_STARTUP = ('flask_script', 'flask_migrate', 'alembic', 'gevent',
+                  'psycogreen', 'multiprocessing')
+
+PHASES = ('interpreter', 'import', 'create_app', 'first_request')
+
+COLD_START = '''
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(os.getenv('APP_SETTINGS'))
+created = time.perf_counter()
+app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - start, 'create_app': created - imported,
+    'first_request': served - created,
+    'loaded': sorted(name for name in sys.modules if name in %r)}))
+'''
+
+
+def run(args, env):
+    return subprocess.run([sys.executable] + args, env=env, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True)
+
+
+def total(phases):
+    return sum(phases[phase] for phase in PHASES)
+
+
+def import_times(env):
+    """Returns the microseconds spent importing each top-level package
+    imported by run.py."""
+    totals = defaultdict(int)
+    stderr = run(['-X', 'importtime', '-c', 'import run'], env).stderr
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(own)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget', type=float, default=BUDGET,
+                        help='cold start budget in milliseconds')
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, APP_SETTINGS='staging', DATABASE_URL=database_url(),
+               PASSWORD_HASH_WORKERS='0')
+
+    totals = import_times(env)
+    print('{:>10}  {}'.format('import ms', 'package'))
+    for name, own in sorted(totals.items(), key=lambda item: -item[1])[
+            :args.top]:
+        print('{:10.1f}  {}'.format(own / 1000, name))
+    print('{:10.1f}  total, {} packages'.format(sum(totals.values()) / 1000,
+                                               len(totals)))
+
+    # the fastest of a few runs, the first one may wait on a cold disk cache
+    phases = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        run(['-c', 'pass'], env)
+        interpreter = time.perf_counter() - start
+        result = json.loads(run(['-c', COLD_START % (NOT_AT_STARTUP,)],
+                                env).stdout)
+        result['interpreter'] = interpreter
+        if phases is None or total(result) < total(phases):
+            phases = result
+    print()
+    for phase in PHASES:
+        print('{:13} {:8.1f}ms'.format(phase, phases[phase] * 1000))
+    print('{:13} {:8.1f}ms of a {:.0f}ms budget'.format(
+        'cold start', total(phases) * 1000, args.budget))
+    if phases['loaded']:
+        print('imported at startup but should not be: {}'.format(
+            ', '.join(phases['loaded'])))
+    if total(phases) * 1000 > args.budget or phases['loaded']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
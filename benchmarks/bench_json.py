@@ -0,0 +1,91 @@
+"""Measures the share of a large listing request spent encoding JSON, for
+each available encoder backend.
+
+    python -m benchmarks.bench_json --bucketlists 100 --items 50 --requests 50
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import bench_app
+
+
+def seed(app, bucketlists, items):
+    """Creates a user owning bucketlists with items, returns its token."""
+    from app import db
+    from app.models import BucketList, BucketListItem, User
+
+    client = app.test_client()
+    user = {"username": "bench", "password": "bench-password",
+            "email": "bench@example.com"}
+    client.post('/auth/register/', data=json.dumps(user),
+                content_type='application/json')
+    res = client.post('/auth/login/', data=json.dumps(user),
+                      content_type='application/json')
+    token = json.loads(res.data.decode())['token']
+    with app.app_context():
+        user_id = User.query.filter_by(username='bench').one().id
+        db.session.execute(BucketList.__table__.insert(), [
+            {'name': 'list {}'.format(n), 'created_by': user_id}
+            for n in range(bucketlists)])
+        ids = [row.id for row in BucketList.query.with_entities(BucketList.id)]
+        BucketListItem.bulk_insert([
+            {'name': 'item {}'.format(n), 'bucketlist_id': bucketlist_id,
+             'done': n % 2 == 0}
+            for bucketlist_id in ids for n in range(items)])
+        db.session.commit()
+    return token
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bucketlists', type=int, default=100)
+    parser.add_argument('--items', type=int, default=50,
+                        help='items per bucketlist')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    # every request must be answered from the database
+    app = bench_app(RESPONSE_CACHE_BACKEND=None, MAX_BUCKETLISTS_PER_PAGE=1000)
+    from app import encoders
+    from app.cache import response_cache
+
+    response_cache.init_app(app)
+
+    token = seed(app, args.bucketlists, args.items)
+    url = '/api/v1/bucketlists/?limit={}'.format(args.bucketlists)
+    headers = {'Authorization': token}
+    encoding = [0.0]
+    dumps = encoders.Encoder.dumps
+
+    def timed_dumps(self, data):
+        start = time.perf_counter()
+        try:
+            return dumps(self, data)
+        finally:
+            encoding[0] += time.perf_counter() - start
+
+    encoders.Encoder.dumps = timed_dumps
+    backends = ['stdlib'] + (['orjson'] if encoders.orjson else [])
+    for backend in backends:
+        app.config['JSON_ENCODER_BACKEND'] = backend
+        encoders.encoder.init_app(app)
+        client = app.test_client()
+        size = len(client.get(url, headers=headers).data)
+        encoding[0] = 0.0
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            res = client.get(url, headers=headers)
+            assert res.status_code == 200, res.data
+        elapsed = time.perf_counter() - start
+        print('{:7} {:7.2f}ms/request  {:6.2f}ms encoding  {:5.1f}% of the '
+              'request, {} bytes'.format(
+                  backend, elapsed * 1000 / args.requests,
+                  encoding[0] * 1000 / args.requests,
+                  encoding[0] * 100 / elapsed, size))
+    if 'orjson' not in backends:
+        print('orjson is not installed, only the stdlib backend was measured')
+
+
+if __name__ == '__main__':
+    main()
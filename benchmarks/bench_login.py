@@ -0,0 +1,55 @@
+"""Measures logins per second, and per hashing core, through /auth/login/.
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 8 \
+        --hash-workers 4 --method pbkdf2:sha256:50000
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import bench_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--hash-workers', type=int, default=0,
+                        help='PASSWORD_HASH_WORKERS, 0 hashes inline')
+    parser.add_argument('--method', default='pbkdf2:sha256:50000',
+                        help='PASSWORD_HASH_METHOD')
+    args = parser.parse_args()
+
+    app = bench_app(PASSWORD_HASH_WORKERS=args.hash_workers,
+                    PASSWORD_HASH_METHOD=args.method)
+    user = {"username": "bench", "password": "bench-password",
+            "email": "bench@example.com"}
+    res = app.test_client().post('/auth/register/', data=json.dumps(user),
+                                 content_type='application/json')
+    assert res.status_code == 201, res.data
+
+    def login(_):
+        res = app.test_client().post('/auth/login/', data=json.dumps(user),
+                                     content_type='application/json')
+        assert res.status_code == 200, res.data
+
+    # warm up the pool so process start-up is not measured
+    list(map(login, range(max(args.hash_workers, 1))))
+
+    start = time.time()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(login, range(args.logins)))
+    elapsed = time.time() - start
+
+    # inline hashing holds the GIL, so it never uses more than one core
+    cores = min(args.hash_workers or 1, multiprocessing.cpu_count())
+    rate = args.logins / elapsed
+    print('{} logins with {}, {} threads, {} hashing core(s): {:.2f}s'.format(
+        args.logins, args.method, args.concurrency, cores, elapsed))
+    print('{:.1f} logins/s, {:.1f} logins/s per core'.format(rate, rate / cores))
+
+
+if __name__ == '__main__':
+    main()
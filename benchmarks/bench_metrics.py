@@ -0,0 +1,72 @@
+"""Measures what app.metrics costs per request by timing the same listing
+requests with METRICS_ENABLED on and off, each in a fresh process.
+
+    python -m benchmarks.bench_metrics --requests 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import bench_app
+
+
+def serve(args):
+    """Runs in the measuring process, configured from the environment."""
+    app = bench_app(RESPONSE_CACHE_BACKEND=None)
+    from app.cache import response_cache
+
+    # every request must reach the database
+    response_cache.init_app(app)
+    client = app.test_client()
+    user = {'username': 'bench', 'password': 'bench-password',
+            'email': 'bench@example.com'}
+    client.post('/auth/register/', data=json.dumps(user),
+                content_type='application/json')
+    token = json.loads(client.post('/auth/login/', data=json.dumps(user),
+                                   content_type='application/json')
+                       .data.decode())['token']
+    client.post('/api/v1/bucketlists/', data=json.dumps({'name': 'bench'}),
+                content_type='application/json',
+                headers={'Authorization': token})
+
+    best = None
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.get('/api/v1/bucketlists/',
+                       headers={'Authorization': token})
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(best / args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    per_request = {}
+    for enabled in ('0', '1'):
+        env = dict(os.environ, METRICS_ENABLED=enabled)
+        output = subprocess.check_output(
+            [sys.executable, '-m', 'benchmarks.bench_metrics', '--serve',
+             '--requests', str(args.requests), '--rounds', str(args.rounds)],
+            env=env, universal_newlines=True)
+        per_request[enabled] = float(output.split()[-1])
+        print('metrics {:3} {:8.1f}us/request'.format(
+            'on' if enabled == '1' else 'off', per_request[enabled] * 1e6))
+    print('overhead {:+.1f}us/request ({:+.1f}%)'.format(
+        (per_request['1'] - per_request['0']) * 1e6,
+        (per_request['1'] / per_request['0'] - 1) * 100))
+
+
+if __name__ == '__main__':
+    main()
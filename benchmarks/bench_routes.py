@@ -0,0 +1,385 @@
+"""Drives every route of the API concurrently against seeded data and
+reports throughput and p50/p95/p99 latency per endpoint, saved as JSON so
+that runs on different commits can be compared.
+
+    python -m benchmarks.bench_routes run --users 50 --bucketlists 20 \
+        --items 10 --requests 100 --concurrency 8
+    python -m benchmarks.bench_routes compare BASE.json HEAD.json
+
+Requests go through the Flask test client unless --url names a server
+running against the same database (BENCH_DATABASE_URL) and SECRET_KEY.
+Results are written to benchmarks/results/, named after the commit.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from benchmarks.common import bench_app
+from benchmarks.seed import SEED_PASSWORD, seed
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PERCENTILES = (50, 95, 99)
+
+
+class TestClient(object):
+    """Calls the app in this process."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def call(self, method, path, body=None, token=None, data=None):
+        headers = {'Authorization': token} if token else {}
+        res = self.app.test_client().open(
+            path, method=method, headers=headers,
+            data=data if data is not None else
+            json.dumps(body) if body is not None else None,
+            content_type='application/json')
+        return res.status_code, res.data
+
+
+class HTTPClient(object):
+    """Calls a server over HTTP."""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def call(self, method, path, body=None, token=None, data=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = token
+        if data is None and body is not None:
+            data = json.dumps(body)
+        request = Request(self.url + path, method=method, headers=headers,
+                          data=data.encode() if data is not None else None)
+        try:
+            with urlopen(request, timeout=60) as response:
+                return response.status, response.read()
+        except HTTPError as error:
+            return error.code, error.read()
+
+
+class Scenario(object):
+    """Builds requests to every endpoint on behalf of random seeded users.
+    Anything a request needs, e.g. a bucketlist to delete, is created while
+    building it, before the clock starts.
+    """
+    counter = itertools.count()
+
+    def __init__(self, client, users, metrics_token=None):
+        self.client = client
+        self.users = users
+        self.metrics_token = metrics_token
+
+    def unique(self):
+        return '{} {}'.format(os.getpid(), next(self.counter))
+
+    def user(self, rng):
+        return rng.choice(self.users)
+
+    def bucketlist(self, user, rng):
+        return rng.choice(user['bucketlists'])
+
+    def item(self, user, rng):
+        bucketlist_id = self.bucketlist(user, rng)
+        return bucketlist_id, rng.choice(user['items'][bucketlist_id])
+
+    def create_bucketlist(self, user):
+        status, body = self.client.call(
+            'POST', '/api/v1/bucketlists/', {'name': 'new ' + self.unique()},
+            user['token'])
+        return json.loads(body.decode())['bucketlists']['id']
+
+    def create_item(self, user, bucketlist_id):
+        status, body = self.client.call(
+            'POST', '/api/v1/bucketlists/{}/items/'.format(bucketlist_id),
+            {'name': 'new ' + self.unique()}, user['token'])
+        return json.loads(body.decode())['id']
+
+    def requests(self):
+        """Returns each endpoint's name and the function preparing a
+        request to it as (method, path, body, token, raw data)."""
+        def get(path):
+            return lambda user, rng: ('GET', path, None, user['token'], None)
+
+        def scrape(path):
+            return lambda user, rng: (
+                'GET', path, None, 'Bearer {}'.format(self.metrics_token),
+                None)
+
+        def one(user, rng):
+            return ('GET', '/api/v1/bucketlists/{}'.format(
+                self.bucketlist(user, rng)), None, user['token'], None)
+
+        def put(user, rng):
+            return ('PUT', '/api/v1/bucketlists/{}'.format(
+                self.bucketlist(user, rng)), {'name': 'renamed ' + self.unique()},
+                user['token'], None)
+
+        def delete(user, rng):
+            return ('DELETE', '/api/v1/bucketlists/{}'.format(
+                self.create_bucketlist(user)), None, user['token'], None)
+
+        def items(user, rng):
+            return ('GET', '/api/v1/bucketlists/{}/items/'.format(
+                self.bucketlist(user, rng)), None, user['token'], None)
+
+        def add_item(user, rng):
+            return ('POST', '/api/v1/bucketlists/{}/items/'.format(
+                self.bucketlist(user, rng)), {'name': 'new ' + self.unique()},
+                user['token'], None)
+
+        def patch_items(user, rng):
+            return ('PATCH', '/api/v1/bucketlists/{}/items/'.format(
+                self.bucketlist(user, rng)), {'done': rng.random() < 0.5},
+                user['token'], None)
+
+        def get_item(user, rng):
+            return ('GET', '/api/v1/bucketlists/{}/items/{}'.format(
+                *self.item(user, rng)), None, user['token'], None)
+
+        def put_item(user, rng):
+            return ('PUT', '/api/v1/bucketlists/{}/items/{}'.format(
+                *self.item(user, rng)), {'name': 'renamed ' + self.unique()},
+                user['token'], None)
+
+        def delete_item(user, rng):
+            bucketlist_id = self.bucketlist(user, rng)
+            return ('DELETE', '/api/v1/bucketlists/{}/items/{}'.format(
+                bucketlist_id, self.create_item(user, bucketlist_id)), None,
+                user['token'], None)
+
+        def register(user, rng):
+            name = 'user ' + self.unique()
+            return ('POST', '/auth/register/', {
+                'username': name, 'password': SEED_PASSWORD,
+                'email': name.replace(' ', '.') + '@example.com'}, None, None)
+
+        def login(user, rng):
+            return ('POST', '/auth/login/', {
+                'username': user['username'], 'password': SEED_PASSWORD},
+                None, None)
+
+        def import_(user, rng):
+            name = 'imported ' + self.unique()
+            lines = [{'type': 'bucketlist', 'id': 1, 'name': name}] + [
+                {'type': 'item', 'bucketlist_id': 1, 'name': 'item {}'.format(n)}
+                for n in range(10)]
+            return ('POST', '/api/v1/bucketlists/import', None, user['token'],
+                    '\n'.join(json.dumps(line) for line in lines))
+
+        return [
+            ('GET /', get('/')),
+            ('GET /metrics/pool', scrape('/metrics/pool')),
+            ('GET /metrics', scrape('/metrics')),
+            ('POST /auth/register/', register),
+            ('POST /auth/login/', login),
+            ('GET /api/v1/bucketlists/', get('/api/v1/bucketlists/')),
+            ('GET /api/v1/bucketlists/?q=', get('/api/v1/bucketlists/?q=visit')),
+            ('POST /api/v1/bucketlists/', lambda user, rng: (
+                'POST', '/api/v1/bucketlists/', {'name': 'new ' + self.unique()},
+                user['token'], None)),
+            ('GET /api/v1/bucketlists/export', get('/api/v1/bucketlists/export')),
+            ('POST /api/v1/bucketlists/import', import_),
+            ('GET /api/v1/bucketlists/<id>', one),
+            ('PUT /api/v1/bucketlists/<id>', put),
+            ('DELETE /api/v1/bucketlists/<id>', delete),
+            ('GET /api/v1/bucketlists/<id>/items/', items),
+            ('POST /api/v1/bucketlists/<id>/items/', add_item),
+            ('PATCH /api/v1/bucketlists/<id>/items/', patch_items),
+            ('GET /api/v1/bucketlists/<id>/items/<item_id>', get_item),
+            ('PUT /api/v1/bucketlists/<id>/items/<item_id>', put_item),
+            ('DELETE /api/v1/bucketlists/<id>/items/<item_id>', delete_item),
+        ]
+
+
+def percentile(ordered, rank):
+    """The nearest-rank percentile of sorted values."""
+    return ordered[max(int(math.ceil(rank / 100.0 * len(ordered))) - 1, 0)]
+
+
+def commit():
+    try:
+        head = subprocess.check_output(
+            ['git', 'rev-parse', '--short=12', 'HEAD'],
+            universal_newlines=True).strip()
+        dirty = subprocess.check_output(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return head + ('-dirty' if dirty else '')
+
+
+def run(args):
+    app = bench_app(RESPONSE_CACHE_BACKEND=args.cache,
+                    PASSWORD_HASH_WORKERS=0)
+    from app.cache import response_cache
+    from app.models import User
+
+    response_cache.init_app(app)
+    with app.app_context():
+        started = time.time()
+        users = seed(args.users, args.bucketlists, args.items)
+        print('seeded {} users, {} bucketlists, {} items in {:.1f}s'.format(
+            args.users, args.users * args.bucketlists,
+            args.users * args.bucketlists * args.items, time.time() - started))
+        for user in users:
+            token = User.generate_auth_token(user['id'])
+            user['token'] = token.decode() if isinstance(token, bytes) else token
+        database = app.config['SQLALCHEMY_DATABASE_URI'].split(':')[0]
+
+    client = HTTPClient(args.url) if args.url else TestClient(app)
+    scenario = Scenario(client, users, os.getenv('METRICS_TOKEN') or
+                        app.config['METRICS_TOKEN'])
+    tasks = [(name, build) for name, build in scenario.requests()
+             for _ in range(args.requests)]
+    random.Random(1).shuffle(tasks)
+    latencies = {name: [] for name, _ in tasks}
+    errors = {name: 0 for name, _ in tasks}
+    lock = threading.Lock()
+
+    def call(task):
+        name, build = task
+        rng = random.Random()
+        try:
+            method, path, body, token, data = build(scenario.user(rng), rng)
+            start = time.perf_counter()
+            status, _ = client.call(method, path, body, token, data)
+            elapsed = time.perf_counter() - start
+        except Exception:  # counted, the run goes on
+            status, elapsed = None, None
+        with lock:
+            if status is None or status >= 400:
+                errors[name] += 1
+            else:
+                latencies[name].append(elapsed)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(call, tasks))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in sorted(latencies):
+        ordered = sorted(latencies[name])
+        result = {'requests': len(ordered) + errors[name],
+                  'errors': errors[name],
+                  'throughput': len(ordered) / elapsed}
+        for rank in PERCENTILES:
+            result['p{}_ms'.format(rank)] = (
+                percentile(ordered, rank) * 1000 if ordered else None)
+        endpoints[name] = result
+    results = {
+        'commit': commit(),
+        'date': datetime.datetime.utcnow().isoformat() + 'Z',
+        'database': database,
+        'target': args.url or 'test client',
+        'options': {name: getattr(args, name) for name in (
+            'users', 'bucketlists', 'items', 'requests', 'concurrency',
+            'cache')},
+        'elapsed_seconds': elapsed,
+        'throughput': sum(len(values) for values in latencies.values()) / elapsed,
+        'endpoints': endpoints,
+    }
+    report(results)
+
+    output = args.output or os.path.join(
+        RESULTS, 'routes-{}.json'.format(results['commit']))
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output, 'w') as destination:
+        json.dump(results, destination, indent=2, sort_keys=True)
+    print('results written to {}'.format(output))
+
+
+def milliseconds(value):
+    return '{:8.1f}'.format(value) if value is not None else '       -'
+
+
+def report(results):
+    print('{:48} {:>7} {:>6} {:>8} {:>8} {:>8}'.format(
+        'endpoint', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, result in sorted(results['endpoints'].items()):
+        print('{:48} {:7.1f} {:6} {} {} {}'.format(
+            name, result['throughput'], result['errors'],
+            milliseconds(result['p50_ms']), milliseconds(result['p95_ms']),
+            milliseconds(result['p99_ms'])))
+    print('{} requests/s overall, commit {}'.format(
+        round(results['throughput'], 1), results['commit']))
+
+
+def compare(args):
+    with open(args.base) as source:
+        base = json.load(source)
+    with open(args.head) as source:
+        head = json.load(source)
+    print('{} -> {}'.format(base['commit'], head['commit']))
+    if base['options'] != head['options'] or base['database'] != head['database']:
+        print('warning: the runs used different options or databases')
+    print('{:48} {:>19} {:>19} {:>8}'.format(
+        'endpoint', 'p50 ms', 'p95 ms', 'p95'))
+    regressions = []
+    for name in sorted(set(base['endpoints']) & set(head['endpoints'])):
+        before, after = base['endpoints'][name], head['endpoints'][name]
+        if not before['p95_ms'] or not after['p95_ms']:
+            continue
+        change = (after['p95_ms'] / before['p95_ms'] - 1) * 100
+        flag = ''
+        if change > args.threshold:
+            regressions.append(name)
+            flag = '  slower'
+        print('{:48} {:8.1f} -> {:8.1f} {:8.1f} -> {:8.1f} {:+7.1f}%{}'.format(
+            name, before['p50_ms'], after['p50_ms'], before['p95_ms'],
+            after['p95_ms'], change, flag))
+    if regressions:
+        print('{} endpoint(s) over {}% slower at p95'.format(
+            len(regressions), args.threshold))
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help='benchmark this commit')
+    run_parser.add_argument('--users', type=int, default=50)
+    run_parser.add_argument('--bucketlists', type=int, default=20,
+                            help='bucketlists per user')
+    run_parser.add_argument('--items', type=int, default=10,
+                            help='items per bucketlist')
+    run_parser.add_argument('--requests', type=int, default=100,
+                            help='requests per endpoint')
+    run_parser.add_argument('--concurrency', type=int, default=8)
+    run_parser.add_argument('--cache', default=None,
+                            help='RESPONSE_CACHE_BACKEND, none by default')
+    run_parser.add_argument('--url', help='a server to benchmark instead')
+    run_parser.add_argument('--output', help='where to write the results')
+    compare_parser = commands.add_parser(
+        'compare', help='compare the results of two runs')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=10,
+                                help='p95 increase, in percent, to flag')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare(args)
+    elif args.command == 'run':
+        run(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+"""Shared setup for the benchmarks in this package.
+
+Benchmarks run against BENCH_DATABASE_URL when it is set, and against a
+throwaway SQLite file otherwise. Every run starts from empty tables.
+"""
+import os
+import tempfile
+
+os.environ.setdefault('APP_SETTINGS', 'testing')
+os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+
+
+def database_url():
+    return os.getenv('BENCH_DATABASE_URL') or 'sqlite:///{}'.format(
+        os.path.join(tempfile.mkdtemp(), 'bench.db'))
+
+
+def bench_app(**config):
+    """Returns the API app configured for benchmarking.
+    :param config: Settings overriding the testing configuration.
+    """
+    from app import create_app, db
+
+    app = create_app(os.getenv('APP_SETTINGS'))
+    app.config.update(config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
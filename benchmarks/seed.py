@@ -0,0 +1,113 @@
+"""Fills the benchmark database with synthetic users, bucketlists and
+items, inserted in batches rather than through the API.
+
+    python -m benchmarks.seed --users 100 --bucketlists 20 --items 10
+
+Every user has the password SEED_PASSWORD, hashed once for all of them.
+Prints the database URL, to point a server at with DATABASE_URL.
+"""
+import argparse
+import random
+
+from benchmarks.common import bench_app
+
+SEED_PASSWORD = 'bench-password'
+# item and bucketlist names are drawn from these, so that searches find
+# a realistic share of them
+WORDS = ('visit', 'climb', 'learn', 'swim', 'paris', 'kilimanjaro',
+         'guitar', 'spanish', 'marathon', 'skiing', 'himalayas', 'camera',
+         'bbq', 'dojo', 'borabora', 'sunrise', 'volcano', 'museum')
+
+
+def names(prefix, count, rng):
+    return ['{} {} {} {}'.format(prefix, rng.choice(WORDS), rng.choice(WORDS),
+                                 number)
+            for number in range(count)]
+
+
+def insert(table, rows, batch_size):
+    from app import db
+
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+
+
+def seed(users, bucketlists, items, batch_size=1000, seed_value=0):
+    """Adds users owning bucketlists of items, from an app context.
+    :param users: The number of users.
+    :param bucketlists: The number of bucketlists per user.
+    :param items: The number of items per bucketlist.
+    :return: One dict per user with its id, username, the ids of its
+    bucketlists and, per bucketlist id, the ids of its items.
+    """
+    from flask import current_app
+    from werkzeug.security import generate_password_hash
+
+    from app import db
+    from app.models import User, BucketList, BucketListItem
+
+    rng = random.Random(seed_value)
+    password = generate_password_hash(
+        SEED_PASSWORD, current_app.config['PASSWORD_HASH_METHOD'])
+    first = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    insert(User.__table__, [
+        {'username': 'seed{}'.format(first + number),
+         'email': 'seed{}@example.com'.format(first + number),
+         'user_password': password} for number in range(users)], batch_size)
+    seeded = [{'id': row.id, 'username': row.username, 'bucketlists': [],
+               'items': {}}
+              for row in User.query.with_entities(User.id, User.username)
+              .filter(User.id >= first).order_by(User.id)]
+    owners = {user['id']: user for user in seeded}
+
+    insert(BucketList.__table__, [
+        {'name': name, 'created_by': user['id']} for user in seeded
+        for name in names('list', bucketlists, rng)], batch_size)
+    for bucketlist_id, owner in BucketList.query.with_entities(
+            BucketList.id, BucketList.created_by).filter(
+            BucketList.created_by >= first).order_by(BucketList.id):
+        owners[owner]['bucketlists'].append(bucketlist_id)
+        owners[owner]['items'][bucketlist_id] = []
+    bucketlist_owners = {bucketlist_id: user for user in seeded
+                         for bucketlist_id in user['bucketlists']}
+
+    insert(BucketListItem.__table__, [
+        {'name': name, 'bucketlist_id': bucketlist_id,
+         'done': rng.random() < 0.3}
+        for bucketlist_id in bucketlist_owners
+        for name in names('item', items, rng)], batch_size)
+    for item_id, bucketlist_id in BucketListItem.query.with_entities(
+            BucketListItem.id, BucketListItem.bucketlist_id).join(
+            BucketList, BucketList.id == BucketListItem.bucketlist_id).filter(
+            BucketList.created_by >= first).order_by(BucketListItem.id):
+        bucketlist_owners[bucketlist_id]['items'][bucketlist_id].append(item_id)
+    # the items went in without the ORM, which keeps the counters otherwise
+    items_table = BucketListItem.__table__
+    counted = db.select([db.func.count()]).where(
+        items_table.c.bucketlist_id == BucketList.__table__.c.id)
+    db.session.execute(BucketList.__table__.update().where(
+        BucketList.__table__.c.created_by >= first).values(
+        item_count=counted.as_scalar(),
+        done_count=counted.where(items_table.c.done).as_scalar()))
+    db.session.commit()
+    return seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--bucketlists', type=int, default=20,
+                        help='bucketlists per user')
+    parser.add_argument('--items', type=int, default=10,
+                        help='items per bucketlist')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = bench_app()
+    with app.app_context():
+        seed(args.users, args.bucketlists, args.items, args.batch_size)
+    print(app.config['SQLALCHEMY_DATABASE_URI'])
+
+
+if __name__ == '__main__':
+    main()
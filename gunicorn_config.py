@@ -0,0 +1,68 @@
+"""Gunicorn settings, e.g. `gunicorn -c gunicorn_config.py`.
+
+The app is imported once in the master and forked into the workers, which
+share its memory copy-on-write. Worker type and count come from the
+configuration named by APP_SETTINGS.
+"""
+import gc
+import multiprocessing
+import os
+
+# workers share their request metrics through this directory, one per
+# server within RUNTIME_DIR unless set; it has to be set before the
+# configuration is read
+os.environ.setdefault('METRICS_DIR', 'metrics-{}'.format(os.getpid()))
+
+from instance.config import app_config
+
+app_settings = app_config[os.getenv('APP_SETTINGS') or 'production']
+
+bind = '0.0.0.0:{}'.format(os.getenv('PORT', 5000))
+worker_class = app_settings.GUNICORN_WORKER_CLASS
+workers = app_settings.GUNICORN_WORKERS or multiprocessing.cpu_count() * 2 + 1
+if app_settings.RESPONSE_CACHE_BACKEND == 'memory' and workers > 1:
+    # a worker would keep serving what another one's writes invalidated
+    raise RuntimeError("RESPONSE_CACHE_BACKEND 'memory' needs a single "
+                       "worker, use 'sqlite' to share it between workers")
+worker_connections = app_settings.GUNICORN_WORKER_CONNECTIONS
+timeout = app_settings.GUNICORN_TIMEOUT
+preload_app = app_settings.GUNICORN_PRELOAD
+# gevent has to patch the standard library before the app is imported
+wsgi_app = 'run_async:app' if worker_class == 'gevent' else 'run:app'
+
+
+def when_ready(server):
+    from app.metrics import clear_directory
+
+    # counts left behind by a previous server would be added to this one's
+    if app_settings.METRICS_DIR:
+        clear_directory(app_settings.METRICS_DIR)
+    # keep the collector from touching, and so copying, the objects the
+    # workers inherit (Python 3.7+)
+    if preload_app and hasattr(gc, 'freeze'):
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    from app.warmup import dispose_engines
+
+    # the master should hold no connections, a forked one would be used by
+    # two processes at once
+    if preload_app:
+        dispose_engines(server.app.wsgi())
+
+
+def post_fork(server, worker):
+    from app.warmup import dispose_engines
+
+    if preload_app:
+        dispose_engines(server.app.wsgi())
+
+
+def post_worker_init(worker):
+    from app.warmup import warm_up
+
+    if workers > 1:
+        # a worker's search indexes would miss the other workers' writes
+        worker.wsgi.config['SEARCH_INDEX_CACHE'] = False
+    warm_up(worker.wsgi)
@@ -1,4 +1,6 @@
+import getpass
 import os
+import tempfile
 
 
 class Config(object):
@@ -7,12 +9,113 @@ class Config(object):
     CSRF_ENABLED = True
     SECRET_KEY = os.getenv('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
+    # local files shared by the workers of a host, in a directory created
+    # private to the user running them, see app.cache.private_file
+    RUNTIME_DIR = os.getenv('RUNTIME_DIR') or os.path.join(
+        tempfile.gettempdir(), 'bucketlist-{}'.format(getpass.getuser()))
+    # connections kept open by each worker, plus the extra ones it may open
+    # under load; workers * (size + overflow) must stay below the server's
+    # max_connections
+    SQLALCHEMY_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(os.getenv('DATABASE_MAX_OVERFLOW', 10))
+    # the pool size of a worker running on gevent, see create_app: its
+    # greenlets share the pool, so it needs more than a sync worker
+    GEVENT_POOL_SIZE = int(os.getenv('DATABASE_GEVENT_POOL_SIZE', 20))
+    # seconds to wait for a free connection before failing the request
+    SQLALCHEMY_POOL_TIMEOUT = 10
+    # seconds after which a connection is replaced, below any idle timeout
+    # of the server or a proxy in front of it
+    SQLALCHEMY_POOL_RECYCLE = 1800
+    # test connections on checkout (SQLAlchemy 1.2+)
+    SQLALCHEMY_POOL_PRE_PING = True
+    # read replica serving GET and HEAD requests, see app.replica; without
+    # one every query goes to the primary
+    REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    # seconds a user reads from the primary after writing, and the replica
+    # lag in seconds beyond which everybody does, checked every interval
+    REPLICA_READ_YOUR_WRITES_WINDOW = 5
+    REPLICA_MAX_LAG = 2
+    REPLICA_LAG_CHECK_INTERVAL = 1
+    # where recent writers are remembered: 'memory' per worker, or 'sqlite'
+    # shared between the workers of a host, in a file private to the user
+    # running them. Either only gives read-your-writes within one host:
+    # behind a load balancer spreading a user over several hosts, a read
+    # may reach a host that did not see the write and go to the replica.
+    # Nothing is remembered without a replica.
+    REPLICA_WRITERS_BACKEND = 'sqlite'
+    REPLICA_WRITERS_PATH = os.path.join(RUNTIME_DIR, 'replica-writers.sqlite')
+    BUCKETLISTS_PER_PAGE = 20
+    # keep each user's search index in memory between searches, where the
+    # database has no full-text search (SQLite), see app.search. Other
+    # processes' writes are not seen, so gunicorn_config.py turns it off
+    # for more than one worker.
+    SEARCH_INDEX_CACHE = True
+    MAX_BUCKETLISTS_PER_PAGE = 100
+    # verified tokens kept in memory by each worker, 0 disables the cache
+    TOKEN_CACHE_SIZE = 1024
+    # largest JSON array accepted when creating items in bulk
+    MAX_BULK_ITEMS = 500
+    # rows fetched per round trip when exporting, and written per INSERT
+    # when importing, NDJSON
+    EXPORT_BATCH_SIZE = 1000
+    IMPORT_BATCH_SIZE = 1000
+    # items fetched and written per chunk of a streamed JSON response
+    STREAM_BATCH_SIZE = 500
+    # per-user cache of GET responses, off by default. 'memory' keeps an
+    # LRU in each worker, and a write only clears the worker handling it,
+    # so it is for single worker setups; 'sqlite' shares a local file
+    # between the workers of a single host.
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND') or None
+    RESPONSE_CACHE_TTL = 60
+    RESPONSE_CACHE_MAX_ENTRIES = 10000
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES = 1024 * 1024
+    RESPONSE_CACHE_PATH = os.path.join(RUNTIME_DIR, 'response-cache.sqlite')
+    # 'orjson', 'stdlib', or 'auto' for orjson when it is installed
+    JSON_ENCODER_BACKEND = 'auto'
+    JSONIFY_PRETTYPRINT_REGULAR = False
+    DEFAULT_RENDERERS = [
+        'app.encoders.JSONRenderer',
+        'flask_api.renderers.BrowsableAPIRenderer',
+    ]
+    # per-route latency and SQL metrics at /metrics, see app.metrics, off
+    # unless METRICS_ENABLED=1; with a METRICS_DIR every worker writes its
+    # numbers there, every METRICS_FLUSH_INTERVAL seconds at most, for any
+    # worker to sum them.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '0') != '0'
+    # /metrics and /metrics/pool answer only requests sending this as a
+    # bearer token, and do not exist without one
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # a relative METRICS_DIR is taken within RUNTIME_DIR
+    METRICS_DIR = os.getenv('METRICS_DIR') and os.path.join(
+        RUNTIME_DIR, os.getenv('METRICS_DIR'))
+    METRICS_FLUSH_INTERVAL = 1
+    # gunicorn, see gunicorn_config.py: 'sync' or 'gevent' workers, by
+    # default twice the cores plus one of them, and the app imported once
+    # in the master
+    GUNICORN_WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+    GUNICORN_WORKERS = int(os.getenv('WEB_CONCURRENCY', 0))
+    GUNICORN_WORKER_CONNECTIONS = 200
+    GUNICORN_TIMEOUT = 30
+    GUNICORN_PRELOAD = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+    # werkzeug hash method including its work factor; stored hashes made
+    # with another method are upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:50000'
+    # processes hashing passwords per worker. 0 hashes in the worker: a
+    # sync worker's request waits for the hash either way, and a gevent
+    # worker hashes on its hub's threads, see app.hashing. Always 0 on
+    # gevent, see create_app.
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_TIMEOUT = 30
 
 
 class DevelopmentConfig(Config):
     """Configurations for Development."""
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/flask_db'
+    SQLALCHEMY_POOL_SIZE = 2
+    SQLALCHEMY_MAX_OVERFLOW = 2
 
 
 class TestingConfig(Config):
@@ -20,6 +123,15 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/test_db'
     DEBUG = True
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    SQLALCHEMY_POOL_SIZE = 2
+    SQLALCHEMY_MAX_OVERFLOW = 0
+    SQLALCHEMY_POOL_PRE_PING = False
+    REPLICA_WRITERS_BACKEND = 'memory'
+    RESPONSE_CACHE_BACKEND = 'memory'
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+    METRICS_TOKEN = 'testing-metrics-token'
 
 
 class StagingConfig(Config):
@@ -0,0 +1,40 @@
+"""add item and done counters to bucketlists
+
+Revision ID: 3c9f1e7a5b20
+Revises: 8e5a0c6b2d41
+Create Date: 2026-10-18 11:26:08.417305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9f1e7a5b20'
+down_revision = '8e5a0c6b2d41'
+branch_labels = None
+depends_on = None
+
+BACKFILL = """
+UPDATE bucketlists SET
+    item_count = (SELECT count(*) FROM bucketlistitems
+                  WHERE bucketlistitems.bucketlist_id = bucketlists.id),
+    done_count = (SELECT count(*) FROM bucketlistitems
+                  WHERE bucketlistitems.bucketlist_id = bucketlists.id
+                  AND bucketlistitems.done)
+"""
+
+
+def upgrade():
+    # the server default fills the existing rows, which are then counted
+    op.add_column('bucketlists', sa.Column(
+        'item_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('bucketlists', sa.Column(
+        'done_count', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(BACKFILL)
+
+
+def downgrade():
+    with op.batch_alter_table('bucketlists') as batch_op:
+        batch_op.drop_column('done_count')
+        batch_op.drop_column('item_count')
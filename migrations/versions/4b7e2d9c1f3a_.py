@@ -0,0 +1,42 @@
+"""add indexes for bucketlist and item lookups
+
+Revision ID: 4b7e2d9c1f3a
+Revises: dc4312ac69bd
+Create Date: 2026-10-18 09:12:44.102934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2d9c1f3a'
+down_revision = 'dc4312ac69bd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (created_by, id) also serves lookups by (id, created_by), which the
+    # primary key on id already narrows to a single row.
+    op.create_index('ix_bucketlists_created_by_id', 'bucketlists',
+                    ['created_by', 'id'], unique=False)
+    op.create_index('ix_bucketlists_created_by_name', 'bucketlists',
+                    ['created_by', 'name'], unique=False)
+    op.create_index('ix_bucketlistitems_bucketlist_id_id', 'bucketlistitems',
+                    ['bucketlist_id', 'id'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        # lets ilike('%q%') use an index instead of scanning the table
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_bucketlists_name_trgm', 'bucketlists', ['name'],
+                        unique=False, postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_bucketlists_name_trgm', table_name='bucketlists')
+    op.drop_index('ix_bucketlistitems_bucketlist_id_id',
+                  table_name='bucketlistitems')
+    op.drop_index('ix_bucketlists_created_by_name', table_name='bucketlists')
+    op.drop_index('ix_bucketlists_created_by_id', table_name='bucketlists')
@@ -0,0 +1,67 @@
+"""delete bucketlists and items with ON DELETE CASCADE
+
+Revision ID: 5d1b8f3e9a62
+Revises: 3c9f1e7a5b20
+Create Date: 2026-10-18 14:02:51.730948
+
+"""
+from contextlib import contextmanager
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1b8f3e9a62'
+down_revision = '3c9f1e7a5b20'
+branch_labels = None
+depends_on = None
+
+# names the foreign keys created unnamed, which SQLite does not name either
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+FOREIGN_KEYS = (('bucketlists', 'created_by', 'users'),
+                ('bucketlistitems', 'bucketlist_id', 'bucketlists'))
+
+
+@contextmanager
+def foreign_keys_off():
+    """SQLite replaces a table by copying it, and with foreign keys on,
+    dropping the original would fail or cascade to the referring rows."""
+    bind = op.get_bind()
+    enforced = (bind.dialect.name == 'sqlite' and
+                bind.execute('PRAGMA foreign_keys').scalar())
+    if enforced:
+        op.execute('PRAGMA foreign_keys=OFF')
+    try:
+        yield
+    finally:
+        if enforced:
+            op.execute('PRAGMA foreign_keys=ON')
+
+
+def replace_foreign_key(table, column, referred, ondelete):
+    name = 'fk_{}_{}_{}'.format(table, column, referred)
+    for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if foreign_key['constrained_columns'] == [column]:
+            # PostgreSQL named it <table>_<column>_fkey
+            name = foreign_key['name'] or name
+    with op.batch_alter_table(
+            table, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(name, type_='foreignkey')
+        batch_op.create_foreign_key(
+            'fk_{}_{}_{}'.format(table, column, referred), referred,
+            [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    # both columns are indexed, so the cascades find the rows they delete
+    with foreign_keys_off():
+        for table, column, referred in FOREIGN_KEYS:
+            replace_foreign_key(table, column, referred, 'CASCADE')
+
+
+def downgrade():
+    with foreign_keys_off():
+        for table, column, referred in reversed(FOREIGN_KEYS):
+            replace_foreign_key(table, column, referred, None)
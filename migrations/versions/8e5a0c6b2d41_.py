@@ -0,0 +1,34 @@
+"""add full-text search indexes on bucketlist and item names
+
+Revision ID: 8e5a0c6b2d41
+Revises: 4b7e2d9c1f3a
+Create Date: 2026-10-18 10:03:27.581246
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e5a0c6b2d41'
+down_revision = '4b7e2d9c1f3a'
+branch_labels = None
+depends_on = None
+
+# must match app.search.PostgresSearch for the planner to use the indexes
+FTS_INDEX = ("CREATE INDEX ix_{table}_name_fts ON {table} "
+             "USING gin (to_tsvector('simple', coalesce(name, '')))")
+
+
+def upgrade():
+    # other databases fall back to app.search.InvertedIndex
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(FTS_INDEX.format(table='bucketlists'))
+        op.execute(FTS_INDEX.format(table='bucketlistitems'))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_bucketlistitems_name_fts',
+                      table_name='bucketlistitems')
+        op.drop_index('ix_bucketlists_name_fts', table_name='bucketlists')
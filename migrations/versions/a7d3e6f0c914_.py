@@ -0,0 +1,47 @@
+"""add the data version of users
+
+Revision ID: a7d3e6f0c914
+Revises: 5d1b8f3e9a62
+Create Date: 2026-10-18 16:37:12.094521
+
+"""
+from contextlib import contextmanager
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e6f0c914'
+down_revision = '5d1b8f3e9a62'
+branch_labels = None
+depends_on = None
+
+
+@contextmanager
+def foreign_keys_off():
+    """SQLite drops a column by copying the table, and with foreign keys
+    on, dropping the original users would cascade to their bucketlists."""
+    bind = op.get_bind()
+    enforced = (bind.dialect.name == 'sqlite' and
+                bind.execute('PRAGMA foreign_keys').scalar())
+    if enforced:
+        op.execute('PRAGMA foreign_keys=OFF')
+    try:
+        yield
+    finally:
+        if enforced:
+            op.execute('PRAGMA foreign_keys=ON')
+
+
+def upgrade():
+    op.add_column('users', sa.Column(
+        'data_version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('data_modified', sa.DateTime(),
+                                     nullable=True))
+
+
+def downgrade():
+    with foreign_keys_off(), op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_modified')
+        batch_op.drop_column('data_version')
@@ -0,0 +1,31 @@
+"""drop the trigram index on bucketlist names
+
+Revision ID: c2f8a4d61b07
+Revises: a7d3e6f0c914
+Create Date: 2026-10-18 18:05:27.613208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f8a4d61b07'
+down_revision = 'a7d3e6f0c914'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # search uses the full-text indexes since 8e5a0c6b2d41, nothing runs
+    # ilike('%q%') any more
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_bucketlists_name_trgm', table_name='bucketlists')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_bucketlists_name_trgm', 'bucketlists', ['name'],
+                        unique=False, postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
@@ -0,0 +1,32 @@
+"""Serves the API on a gevent event loop.
+
+Every request runs in a greenlet, and the standard library is patched so
+that sockets, locks and sleeps yield to the loop instead of blocking the
+worker. With psycogreen, psycopg2 waits for the database the same way, so
+one worker keeps many requests in flight while they wait on queries and
+the connection pool hands connections out to greenlets.
+
+    python run_async.py
+    gunicorn -k gevent --worker-connections 200 run_async:app
+"""
+import os
+
+from gevent import monkey
+monkey.patch_all()
+
+try:
+    import psycopg2
+except ImportError:  # SQLite needs no patching
+    psycopg2 = None
+else:
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+from app import create_app
+
+app = create_app(os.getenv('APP_SETTINGS'))
+
+if __name__ == '__main__':
+    from gevent.pywsgi import WSGIServer
+
+    WSGIServer(('0.0.0.0', int(os.getenv('PORT', 5000))), app).serve_forever()
@@ -0,0 +1,144 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import unittest
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from app import create_app, db
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# values that legitimately differ between two runs
+VOLATILE = ("date_created", "date_modified", "token")
+
+
+def normalize(data):
+    if isinstance(data, dict):
+        return dict((key, "<{}>".format(key) if key in VOLATILE
+                     else normalize(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [normalize(value) for value in data]
+    return data
+
+
+def scenario(call):
+    """Exercises every route the way a client would and returns what each
+    request answered.
+    :param call: A function (method, path, body, token) -> (status, data).
+    """
+    user = {"username": "nerd", "password": "nerdy", "email": "nerd@tests.com"}
+    results = [call("POST", "/auth/register/", user, None),
+               call("POST", "/auth/register/", user, None),
+               call("POST", "/auth/login/",
+                    {"username": "nobody", "password": "nerdy"}, None)]
+    status, data = call("POST", "/auth/login/", user, None)
+    results.append((status, data))
+    token = data["token"]
+    results += [
+        call("GET", "/api/v1/bucketlists/", None, None),
+        call("GET", "/api/v1/bucketlists/", None, "not-a-token"),
+        call("POST", "/api/v1/bucketlists/", {"name": "Go to Borabora"}, token),
+        call("POST", "/api/v1/bucketlists/", {"name": "Go to Borabora"}, token),
+        call("POST", "/api/v1/bucketlists/", {"name": "Climb a hill"}, token),
+        call("PUT", "/api/v1/bucketlists/2", {"name": "Climb Kilimanjaro"}, token),
+        call("POST", "/api/v1/bucketlists/1/items/", {"name": "Pack"}, token),
+        call("POST", "/api/v1/bucketlists/1/items/",
+             [{"name": "Fly"}, {"name": "Swim"}], token),
+        call("POST", "/api/v1/bucketlists/1/items/", [{"name": ""}], token),
+        call("PUT", "/api/v1/bucketlists/1/items/2", {"name": "Fly over"}, token),
+        call("GET", "/api/v1/bucketlists/1/items/2", None, token),
+        call("GET", "/api/v1/bucketlists/1/items/", None, token),
+        call("GET", "/api/v1/bucketlists/1", None, token),
+        call("GET", "/api/v1/bucketlists/?limit=1", None, token),
+        call("GET", "/api/v1/bucketlists/?q=kilimanjaro", None, token),
+        call("GET", "/api/v1/bucketlists/?q=nowhere", None, token),
+        call("DELETE", "/api/v1/bucketlists/1/items/3", None, token),
+        call("DELETE", "/api/v1/bucketlists/2", None, token),
+        call("GET", "/api/v1/bucketlists/", None, token),
+    ]
+    return [(status, normalize(data)) for status, data in results]
+
+
+@unittest.skipIf(gevent is None, "gevent is not installed")
+class AsyncParityTestCase(unittest.TestCase):
+    """Runs the same requests against the sync app and against run_async
+    serving it on an event loop, and expects identical answers."""
+
+    def setUp(self):
+        self.app = create_app(config_name="testing")
+        self.reset_database()
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        env = dict(os.environ, APP_SETTINGS="staging", PORT=str(self.port),
+                   DATABASE_URL=self.app.config["SQLALCHEMY_DATABASE_URI"],
+                   SECRET_KEY=self.app.config["SECRET_KEY"])
+        self.server = subprocess.Popen(
+            [sys.executable, "run_async.py"], cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), 1).close()
+                break
+            except OSError:
+                if time.time() > deadline or self.server.poll() is not None:
+                    self.fail("run_async.py did not start")
+                time.sleep(0.1)
+
+    def reset_database(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+
+    def sync_call(self, method, path, body, token):
+        headers = {"Authorization": token} if token else {}
+        res = self.app.test_client().open(
+            path, method=method, headers=headers,
+            data=json.dumps(body) if body is not None else None,
+            content_type="application/json")
+        return res.status_code, json.loads(res.data.decode())
+
+    def async_call(self, method, path, body, token):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = token
+        request = Request("http://127.0.0.1:{}{}".format(self.port, path),
+                          method=method, headers=headers,
+                          data=json.dumps(body).encode() if body is not None
+                          else None)
+        try:
+            with urlopen(request, timeout=30) as response:
+                return response.status, json.loads(response.read().decode())
+        except HTTPError as error:
+            return error.code, json.loads(error.read().decode())
+
+    def test_same_answers(self):
+        """Test both serving modes answer every request identically."""
+        expected = scenario(self.sync_call)
+        self.reset_database()
+        try:
+            self.assertEqual(scenario(self.async_call), expected)
+        except URLError as error:
+            self.fail("run_async.py failed: {}".format(error))
+
+    def tearDown(self):
+        self.server.terminate()
+        self.server.wait()
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,11 @@
 import unittest
 import json
+from unittest import mock
 
-from app import db
-from app.views import app
-from instance.config import app_config
+from sqlalchemy import event
+
+from app import create_app, db
+from app.cache import response_cache
 
 
 class BucketListTestCase(unittest.TestCase):
@@ -11,9 +13,7 @@ class BucketListTestCase(unittest.TestCase):
 
     def setUp(self):
         """Define test variables and initialize app."""
-        app.config.from_object(app_config["testing"])
-        app.config.from_pyfile('config.py')
-        self.app = app
+        self.app = create_app(config_name="testing")
         self.client = self.app.test_client
         self.bucketlist = {'name': 'Go Skiing in the Himalayas'}
         self.bucketlist2 = {'name': 'Attend a BBQ at the Dojo'}
@@ -206,6 +206,455 @@ class BucketListTestCase(unittest.TestCase):
         self.assertIn("Invalid token. Please register or login.",
                       str(res.data))
 
+    def test_listing_query_count_is_constant(self):
+        """Test listing bucketlists costs the same number of queries
+        regardless of how many bucketlists and items are on the page."""
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        def listing_query_count():
+            del statements[:]
+            with self.app.app_context():
+                event.listen(db.engine, "before_cursor_execute", count_statement)
+                try:
+                    res = self.client().get('/api/v1/bucketlists/',
+                                            headers={"Authorization": self.token})
+                finally:
+                    event.remove(db.engine, "before_cursor_execute",
+                                 count_statement)
+            self.assertEqual(res.status_code, 200)
+            return len(statements)
+
+        for name in ("Visit Lamu", "Climb Kilimanjaro", "Swim in Diani"):
+            res = self.client().post('/api/v1/bucketlists/',
+                                     data=json.dumps({"name": name}),
+                                     content_type="application/json",
+                                     headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, 201)
+            bucketlist_id = json.loads(res.data)["bucketlists"]["id"]
+            res = self.client().post(
+                '/api/v1/bucketlists/{}/items/'.format(bucketlist_id),
+                data=json.dumps(self.item), content_type="application/json",
+                headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, 201)
+            if name == "Visit Lamu":
+                single = listing_query_count()
+
+        self.assertEqual(listing_query_count(), single)
+
+    def test_sparse_fieldsets(self):
+        """Test the listing returns only the fields asked for, and reads
+        the items only when they are included."""
+        for name in ("Visit Lamu", "Climb Kilimanjaro"):
+            res = self.client().post('/api/v1/bucketlists/',
+                                     data=json.dumps({"name": name}),
+                                     content_type="application/json",
+                                     headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, 201)
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(self.item),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", count_statement)
+            try:
+                result = self.client().get(
+                    '/api/v1/bucketlists/?fields=name,item_count&limit=1',
+                    headers={"Authorization": self.token})
+            finally:
+                event.remove(db.engine, "before_cursor_execute",
+                             count_statement)
+        self.assertEqual(result.status_code, 200)
+        page = json.loads(result.data)
+        self.assertEqual(page["bucketlists"],
+                         [{"id": 1, "name": "Visit Lamu", "item_count": 1}])
+        self.assertIn("fields=name", page["next_page"])
+        self.assertFalse([statement for statement in statements
+                          if "bucketlistitems" in statement])
+
+        result = self.client().get(
+            '/api/v1/bucketlists/?fields=name&include=items',
+            headers={"Authorization": self.token})
+        bucketlist = json.loads(result.data)["bucketlists"][0]
+        self.assertEqual(sorted(bucketlist), ["id", "items", "name"])
+        self.assertEqual(bucketlist["items"][0]["name"], self.item["name"])
+
+        # an item write in the same second as the bucketlist's last change
+        # still changes the ETag of the counters
+        result = self.client().get('/api/v1/bucketlists/?fields=item_count',
+                                   headers={"Authorization": self.token})
+        etag = result.headers["ETag"]
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps({"name": "Pack a hat"}),
+                           content_type="application/json",
+                           headers={"Authorization": self.token})
+        result = self.client().get('/api/v1/bucketlists/?fields=item_count',
+                                   headers={"Authorization": self.token,
+                                            "If-None-Match": etag})
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(json.loads(result.data)["bucketlists"][0]["item_count"],
+                         2)
+
+        for query in ("fields=name,owner", "include=tags"):
+            result = self.client().get('/api/v1/bucketlists/?' + query,
+                                       headers={"Authorization": self.token})
+            self.assertEqual(result.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """Test the API pages through bucketlists with opaque cursors."""
+        for name in ("Visit Lamu", "Climb Kilimanjaro", "Swim in Diani"):
+            res = self.client().post('/api/v1/bucketlists/',
+                                     data=json.dumps({"name": name}),
+                                     content_type="application/json",
+                                     headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, 201)
+        result = self.client().get('/api/v1/bucketlists/?limit=2',
+                                   headers={"Authorization": self.token})
+        first_page = json.loads(result.data)
+        self.assertEqual([b["name"] for b in first_page["bucketlists"]],
+                         ["Visit Lamu", "Climb Kilimanjaro"])
+        self.assertFalse(first_page["prev_cursor"])
+        self.assertIn("cursor=", first_page["next_page"])
+
+        result = self.client().get(
+            '/api/v1/bucketlists/?limit=2&cursor={}'.format(
+                first_page["next_cursor"]),
+            headers={"Authorization": self.token})
+        second_page = json.loads(result.data)
+        self.assertEqual([b["name"] for b in second_page["bucketlists"]],
+                         ["Swim in Diani"])
+        self.assertFalse(second_page["next_cursor"])
+
+        result = self.client().get(
+            '/api/v1/bucketlists/?limit=2&cursor={}'.format(
+                second_page["prev_cursor"]),
+            headers={"Authorization": self.token})
+        self.assertEqual(json.loads(result.data)["bucketlists"],
+                         first_page["bucketlists"])
+
+    def test_offset_pagination_invalid_page(self):
+        """Test API reads a page number it cannot parse as the first page."""
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        result = self.client().get('/api/v1/bucketlists/?page=abc',
+                                   headers={"Authorization": self.token})
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(json.loads(result.data)["bucketlists"]), 1)
+
+    def test_pagination_invalid_cursor(self):
+        """Test API rejects a tampered pagination cursor."""
+        result = self.client().get('/api/v1/bucketlists/?cursor=garbage',
+                                   headers={"Authorization": self.token})
+        self.assertEqual(result.status_code, 400)
+        self.assertIn("Invalid pagination cursor.", str(result.data))
+
+    def test_bucketlist_search_drops_an_overtaken_index(self):
+        """Test an index built while a write drops it is not kept."""
+        from app import search
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        bucketlist_id = json.loads(res.data)["bucketlists"]["id"]
+        tokenize = search.tokenize
+
+        def written_meanwhile(text):
+            search.inverted_index.forget_bucketlist(bucketlist_id)
+            return tokenize(text)
+
+        with mock.patch.object(search, "tokenize", written_meanwhile):
+            res = self.client().get('/api/v1/bucketlists/?q=ski',
+                                    headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.data)["bucketlists"]), 1)
+        self.assertNotIn(1, search.inverted_index._users)
+
+        res = self.client().get('/api/v1/bucketlists/?q=himalayas',
+                                headers={"Authorization": self.token})
+        self.assertEqual(len(json.loads(res.data)["bucketlists"]), 1)
+        self.assertIn(1, search.inverted_index._users)
+
+    def test_bucketlist_search_checks_ownership(self):
+        """Test API search never returns another user's bucketlist, even
+        from an index that missed another process reusing an id."""
+        from app import search
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps({"name": "ski trip"}),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/?q=ski',
+                                headers={"Authorization": self.token})
+        self.assertEqual(len(json.loads(res.data)["bucketlists"]), 1)
+        with self.app.app_context():
+            # deleted by another process, which this one's index never sees
+            db.engine.execute("DELETE FROM bucketlists")
+
+        other = {"username": "bob", "password": "bobby",
+                 "email": "bob@tests.com"}
+        self.client().post("/auth/register/", data=json.dumps(other),
+                           content_type="application/json")
+        res = self.client().post("/auth/login/", data=json.dumps(other),
+                                 content_type="application/json")
+        other_token = json.loads(res.data.decode())['token']
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps({"name": "bob secret diary"}),
+                                 content_type="application/json",
+                                 headers={"Authorization": other_token})
+        self.assertEqual(json.loads(res.data)["bucketlists"]["id"], 1)
+
+        res = self.client().get('/api/v1/bucketlists/?q=ski&limit=5',
+                                headers={"Authorization": self.token})
+        self.assertEqual(json.loads(res.data)["bucketlists"], [])
+
+    def test_bucketlist_search_index_cache_can_be_off(self):
+        """Test searches build a throwaway index without the cache."""
+        from app import search
+        self.app.config["SEARCH_INDEX_CACHE"] = False
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/?q=ski',
+                                headers={"Authorization": self.token})
+        self.assertEqual(len(json.loads(res.data)["bucketlists"]), 1)
+        self.assertNotIn(1, search.inverted_index._users)
+
+    def test_bucketlist_search_ranks_names_and_items(self):
+        """Test API search matches item names and ranks name hits first."""
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist2),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        bbq_id = json.loads(res.data)["bucketlists"]["id"]
+        res = self.client().post(
+            '/api/v1/bucketlists/{}/items/'.format(bbq_id),
+            data=json.dumps({"name": "Bring skis for the afterparty"}),
+            content_type="application/json",
+            headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+
+        res = self.client().get('/api/v1/bucketlists/?q=ski',
+                                headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [b["name"] for b in json.loads(res.data)["bucketlists"]],
+            [self.bucketlist["name"], self.bucketlist2["name"]])
+
+        res = self.client().get('/api/v1/bucketlists/?q=ski&limit=1',
+                                headers={"Authorization": self.token})
+        self.assertIn("page=2", json.loads(res.data)["next_page"])
+
+        res = self.client().get('/api/v1/bucketlists/?q=ski+afterparty',
+                                headers={"Authorization": self.token})
+        self.assertEqual(
+            [b["name"] for b in json.loads(res.data)["bucketlists"]],
+            [self.bucketlist2["name"]])
+
+    def test_export_and_import_ndjson(self):
+        """Test API exports bucketlists as NDJSON and imports them back."""
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(self.item),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+
+        res = self.client().get('/api/v1/bucketlists/export',
+                                headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.mimetype, "application/x-ndjson")
+        records = [json.loads(line) for line in res.data.decode().splitlines()]
+        self.assertEqual([r["type"] for r in records], ["bucketlist", "item"])
+        self.assertEqual(records[1]["name"], self.item["name"])
+
+        # rename the exported bucketlist so that the import creates a new one
+        records[0]["name"] = self.bucketlist2["name"]
+        upload = "\n".join(json.dumps(record) for record in records)
+        res = self.client().post('/api/v1/bucketlists/import', data=upload,
+                                 content_type="application/x-ndjson",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(json.loads(res.data)["items"], 1)
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token})
+        imported = json.loads(res.data)["bucketlists"][1]
+        self.assertEqual(imported["name"], self.bucketlist2["name"])
+        self.assertEqual([i["name"] for i in imported["items"]],
+                         [self.item["name"]])
+
+    def test_import_rejects_invalid_ndjson(self):
+        """Test API imports nothing from an upload with a bad line."""
+        upload = json.dumps({"type": "bucketlist", "id": 7, "name": "Fly"}) + \
+            "\nnot json\n"
+        res = self.client().post('/api/v1/bucketlists/import', data=upload,
+                                 content_type="application/x-ndjson",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("Line 2", str(res.data))
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token})
+        self.assertEqual(json.loads(res.data)["bucketlists"], [])
+
+    def test_import_rejects_invalid_names_and_done(self):
+        """Test API rejects a null name and a done status it cannot read,
+        and reads "false" as not done."""
+        bucketlist = json.dumps({"type": "bucketlist", "id": 7, "name": "Fly"})
+        for record, status in (
+                ({"type": "bucketlist", "id": 8, "name": None}, 400),
+                ({"type": "item", "bucketlist_id": 7, "name": 3}, 400),
+                ({"type": "item", "bucketlist_id": 7, "name": "Kite",
+                  "done": "maybe"}, 400),
+                ({"type": "item", "bucketlist_id": 7, "name": "Kite",
+                  "done": "false"}, 201)):
+            res = self.client().post(
+                '/api/v1/bucketlists/import',
+                data=bucketlist + "\n" + json.dumps(record) + "\n",
+                content_type="application/x-ndjson",
+                headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, status, record)
+        res = self.client().get('/api/v1/bucketlists/1/items/',
+                                headers={"Authorization": self.token})
+        self.assertEqual([(i["name"], i["done"])
+                          for i in json.loads(res.data)],
+                         [("Kite", False)])
+
+    def test_conditional_get_of_a_bucketlist(self):
+        """Test API answers a matching If-None-Match with 304."""
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/1',
+                                headers={"Authorization": self.token})
+        self.assertIn('Go Skiing', str(res.data))
+        etag = res.headers["ETag"]
+        self.assertTrue(res.headers["Last-Modified"])
+
+        res = self.client().get('/api/v1/bucketlists/1',
+                                headers={"Authorization": self.token,
+                                         "If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b"")
+        self.assertEqual(res.headers["ETag"], etag)
+
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(self.item),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/1',
+                                headers={"Authorization": self.token,
+                                         "If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(self.item["name"], str(res.data))
+        self.assertNotEqual(res.headers["ETag"], etag)
+
+    def test_conditional_get_after_a_rename_in_the_same_second(self):
+        """Test renaming an item changes the ETags of its bucketlist and
+        item collection, however soon after the last write it comes."""
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(self.item),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        paths = ('/api/v1/bucketlists/1', '/api/v1/bucketlists/1/items/')
+        etags = [self.client().get(path, headers={
+            "Authorization": self.token}).headers["ETag"] for path in paths]
+
+        res = self.client().put('/api/v1/bucketlists/1/items/1',
+                                data=json.dumps({"name": "Renamed"}),
+                                content_type="application/json",
+                                headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        for path, etag in zip(paths, etags):
+            res = self.client().get(path, headers={
+                "Authorization": self.token, "If-None-Match": etag})
+            self.assertEqual(res.status_code, 200, path)
+            self.assertIn("Renamed", str(res.data))
+
+    def test_conditional_get_of_the_listing(self):
+        """Test the listing ETag changes when a bucketlist is added."""
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token})
+        etag = res.headers["ETag"]
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token,
+                                         "If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps(self.bucketlist),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token,
+                                         "If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("Go Skiing", str(res.data))
+
+        # without the response cache, answering a 304 costs one lookup,
+        # whatever the user owns
+        etag = res.headers["ETag"]
+        self.app.config["RESPONSE_CACHE_BACKEND"] = None
+        response_cache.init_app(self.app)
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", count_statement)
+            try:
+                res = self.client().get('/api/v1/bucketlists/',
+                                        headers={"Authorization": self.token,
+                                                 "If-None-Match": etag})
+            finally:
+                event.remove(db.engine, "before_cursor_execute",
+                             count_statement)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn("bucketlist", statements[0])
+
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(self.item),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        res = self.client().get('/api/v1/bucketlists/',
+                                headers={"Authorization": self.token,
+                                         "If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+
     def tearDown(self):
         """teardown all initialized variables."""
         with self.app.app_context():
@@ -1,9 +1,10 @@
 import unittest
 import json
 
-from app import db
-from app.views import app
-from instance.config import app_config
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, BucketList, BucketListItem
 
 
 class BucketListTestCase(unittest.TestCase):
@@ -11,9 +12,7 @@ class BucketListTestCase(unittest.TestCase):
 
     def setUp(self):
         """Define test variables and initialize app."""
-        app.config.from_object(app_config["testing"])
-        app.config.from_pyfile('config.py')
-        self.app = app
+        self.app = create_app(config_name="testing")
         self.client = self.app.test_client
         self.bucketlist = {'name': 'Go Skiing in the Himalayas'}
         self.bucketlist2 = {'name': 'Attend a BBQ at the Dojo'}
@@ -123,6 +122,225 @@ class BucketListTestCase(unittest.TestCase):
         self.assertEqual(result.status_code, 200)
         self.assertEqual(json.loads(result.data)["message"], "Bucketlist item does not exist.")
 
+    def test_bulk_item_creation(self):
+        """Test API creates a JSON array of items in one request."""
+        items = [{"name": "Pack goggles"}, {"name": "Book a lodge"},
+                 {"name": "Rent skis"}]
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(items),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        created = json.loads(res.data)["items"]
+        self.assertEqual([item["name"] for item in created],
+                         [item["name"] for item in items])
+        self.assertEqual(len(set(item["id"] for item in created)), 3)
+        result = self.client().get('/api/v1/bucketlists/1/items/',
+                                   headers={"Authorization": self.token})
+        self.assertEqual(len(json.loads(result.data)), 3)
+
+    def test_bulk_item_creation_rejects_oversized_requests(self):
+        """Test API refuses more items than MAX_BULK_ITEMS at once."""
+        limit = self.app.config["MAX_BULK_ITEMS"]
+        items = [{"name": "Item {}".format(i)} for i in range(limit + 1)]
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(items),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 413)
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps([{"name": "ok"}, {"name": ""}]),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 400)
+        for name in (["a"], 5):
+            res = self.client().post('/api/v1/bucketlists/1/items/',
+                                     data=json.dumps([{"name": name}]),
+                                     content_type="application/json",
+                                     headers={"Authorization": self.token})
+            self.assertEqual(res.status_code, 400)
+        result = self.client().get('/api/v1/bucketlists/1/items/',
+                                   headers={"Authorization": self.token})
+        self.assertEqual(json.loads(result.data), [])
+
+    def test_item_collections_are_streamed(self):
+        """Test API streams item collections as valid JSON in batches."""
+        items = [{"name": "Item {}".format(i)} for i in range(5)]
+        res = self.client().post('/api/v1/bucketlists/1/items/',
+                                 data=json.dumps(items),
+                                 content_type="application/json",
+                                 headers={"Authorization": self.token})
+        self.assertEqual(res.status_code, 201)
+        batch_size = self.app.config["STREAM_BATCH_SIZE"]
+        self.app.config["STREAM_BATCH_SIZE"] = 2
+        try:
+            result = self.client().get('/api/v1/bucketlists/1/items/',
+                                       headers={"Authorization": self.token})
+            self.assertTrue(result.is_streamed)
+            self.assertEqual([item["name"] for item in json.loads(result.data)],
+                             [item["name"] for item in items])
+            result = self.client().get('/api/v1/bucketlists/1',
+                                       headers={"Authorization": self.token})
+            self.assertTrue(result.is_streamed)
+            bucketlist = json.loads(result.data)
+            self.assertEqual(bucketlist["name"], self.bucketlist["name"])
+            self.assertEqual(len(bucketlist["items"]), 5)
+        finally:
+            self.app.config["STREAM_BATCH_SIZE"] = batch_size
+
+    def counters(self):
+        result = self.client().get('/api/v1/bucketlists/',
+                                   headers={"Authorization": self.token})
+        bucketlist = json.loads(result.data)["bucketlists"][0]
+        return bucketlist["item_count"], bucketlist["done_count"]
+
+    def test_item_counters_follow_item_writes(self):
+        """Test the listing counts the items of a bucketlist and those done
+        as items are created, done, undone and deleted."""
+        headers = {"Authorization": self.token}
+        self.assertEqual(self.counters(), (0, 0))
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps(self.item),
+                           content_type="application/json", headers=headers)
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps([{"name": "Pack goggles"},
+                                            {"name": "Rent skis"}]),
+                           content_type="application/json", headers=headers)
+        self.assertEqual(self.counters(), (3, 0))
+        for done in ("true", "true", "false", "true"):
+            res = self.client().put('/api/v1/bucketlists/1/items/2',
+                                    data=json.dumps({"done": done}),
+                                    content_type="application/json",
+                                    headers=headers)
+            self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.counters(), (3, 1))
+        for done in ("maybe", 2):
+            res = self.client().put('/api/v1/bucketlists/1/items/2',
+                                    data=json.dumps({"done": done}),
+                                    content_type="application/json",
+                                    headers=headers)
+            self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.counters(), (3, 1))
+        self.client().delete('/api/v1/bucketlists/1/items/2', headers=headers)
+        self.client().delete('/api/v1/bucketlists/1/items/3', headers=headers)
+        self.assertEqual(self.counters(), (1, 0))
+
+        ndjson = "\n".join(json.dumps(record) for record in [
+            {"type": "bucketlist", "id": 7, "name": self.bucketlist["name"]},
+            {"type": "item", "bucketlist_id": 7, "name": "Buy gloves",
+             "done": True},
+            {"type": "item", "bucketlist_id": 7, "name": "Buy a map"}])
+        res = self.client().post('/api/v1/bucketlists/import', data=ndjson,
+                                 content_type="application/x-ndjson",
+                                 headers=headers)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(self.counters(), (3, 1))
+
+    def test_bulk_item_update(self):
+        """Test API sets done and names of many items with one request,
+        only for the items of a bucketlist the user owns."""
+        headers = {"Authorization": self.token}
+        items = [{"name": "Pack goggles"}, {"name": "Book a lodge"},
+                 {"name": "Rent skis"}]
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps(items),
+                           content_type="application/json", headers=headers)
+
+        def patch(body, bucketlist_id=1):
+            return self.client().patch(
+                '/api/v1/bucketlists/{}/items/'.format(bucketlist_id),
+                data=json.dumps(body), content_type="application/json",
+                headers=headers)
+
+        res = patch({"done": True, "ids": [1, 3]})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)["updated"], 2)
+        date_modified = json.loads(res.data)["date_modified"]
+        result = self.client().get('/api/v1/bucketlists/1/items/3',
+                                   headers=headers)
+        self.assertEqual(json.loads(result.data)[0]["date_modified"],
+                         date_modified)
+        self.assertEqual(self.counters(), (3, 2))
+        # the items already done are left alone
+        self.assertEqual(json.loads(patch({"done": True}).data)["updated"], 1)
+        self.assertEqual(self.counters(), (3, 3))
+        res = patch({"done": False, "filter": {"name": "SKI"}})
+        self.assertEqual(json.loads(res.data)["updated"], 1)
+        self.assertEqual(self.counters(), (3, 2))
+        res = patch({"done": False, "name": "Pack",
+                     "filter": {"done": True}})
+        self.assertEqual(json.loads(res.data)["updated"], 2)
+        self.assertEqual(self.counters(), (3, 0))
+        result = self.client().get('/api/v1/bucketlists/1/items/',
+                                   headers=headers)
+        self.assertEqual([item["name"] for item in json.loads(result.data)],
+                         ["Pack", "Pack", "Rent skis"])
+
+        user = {"username": "other", "password": "other",
+                "email": "other@tests.com"}
+        self.client().post("/auth/register/", data=json.dumps(user),
+                           content_type="application/json")
+        token = json.loads(self.client().post(
+            "/auth/login/", data=json.dumps(user),
+            content_type="application/json").data.decode())['token']
+        res = self.client().patch('/api/v1/bucketlists/1/items/',
+                                  data=json.dumps({"done": True}),
+                                  content_type="application/json",
+                                  headers={"Authorization": token})
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(self.counters(), (3, 0))
+        # nothing left to change in a bucketlist of one's own
+        res = patch({"done": False})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(json.loads(res.data)["updated"], 0)
+        self.assertEqual(patch({"done": True}, 42).status_code, 404)
+
+        for body in ({}, {"name": " "}, {"done": True, "ids": "1"},
+                     {"done": True, "filter": {"id": 1}}, {"done": "maybe"},
+                     {"done": 2}, {"done": True, "filter": {"done": None}},
+                     {"name": 5}, {"name": ["a"]},
+                     {"done": True, "filter": {"name": 5}}):
+            self.assertEqual(patch(body).status_code, 400)
+
+    def test_deletes_cascade_in_the_database(self):
+        """Test deleting a bucketlist or a user leaves deleting the rows
+        below them to the database, without loading them first."""
+        items = [{"name": "Item {}".format(i)} for i in range(5)]
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps(items),
+                           content_type="application/json",
+                           headers={"Authorization": self.token})
+        statements = []
+
+        def count_statement(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            event.listen(db.engine, "before_cursor_execute", count_statement)
+            try:
+                res = self.client().delete('/api/v1/bucketlists/1',
+                                           headers={"Authorization": self.token})
+            finally:
+                event.remove(db.engine, "before_cursor_execute",
+                             count_statement)
+            self.assertEqual(res.status_code, 200)
+            self.assertFalse([statement for statement in statements
+                              if "bucketlistitems" in statement])
+            self.assertEqual(BucketListItem.query.count(), 0)
+
+            self.client().post('/api/v1/bucketlists/',
+                               data=json.dumps(self.bucketlist2),
+                               content_type="application/json",
+                               headers={"Authorization": self.token})
+            self.client().post('/api/v1/bucketlists/2/items/',
+                               data=json.dumps(items),
+                               content_type="application/json",
+                               headers={"Authorization": self.token})
+            db.session.delete(User.query.filter_by(username="nerd").one())
+            db.session.commit()
+            self.assertEqual(BucketList.query.count(), 0)
+            self.assertEqual(BucketListItem.query.count(), 0)
+
     def tearDown(self):
         """teardown all initialized variables."""
         with self.app.app_context():
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.cache import (MemoryBackend, SQLiteBackend, private_file,
+                       response_cache)
+
+
+class CacheBackendTestCase(unittest.TestCase):
+    """This class represents the response cache backends test case"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backends = [
+            MemoryBackend(max_entries=2, max_bytes=1024),
+            SQLiteBackend(os.path.join(self.directory, "cache.sqlite"),
+                          max_entries=2)
+        ]
+
+    def test_entries_are_dropped_per_user(self):
+        """Test invalidating a user leaves other users' entries alone."""
+        for backend in self.backends:
+            backend.set(1, "/a", b"one", 60, backend.generation(1))
+            backend.set(2, "/a", b"two", 60, backend.generation(2))
+            backend.invalidate(1)
+            self.assertIsNone(backend.get(1, "/a"))
+            self.assertEqual(backend.get(2, "/a"), b"two")
+
+    def test_responses_racing_a_write_are_not_stored(self):
+        """Test a response built before an invalidation is discarded."""
+        for backend in self.backends:
+            generation = backend.generation(1)
+            backend.invalidate(1)
+            backend.set(1, "/a", b"stale", 60, generation)
+            self.assertIsNone(backend.get(1, "/a"))
+
+    def test_expired_entries_are_not_served(self):
+        """Test entries are never served past their TTL."""
+        for backend in self.backends:
+            backend.set(1, "/a", b"one", -1, backend.generation(1))
+            self.assertIsNone(backend.get(1, "/a"))
+
+    def test_entry_count_is_bounded(self):
+        """Test the backends never hold more than max_entries."""
+        for backend in self.backends:
+            for path in ("/a", "/b", "/c"):
+                backend.set(1, path, b"x", 60, backend.generation(1))
+            self.assertEqual(backend.count(), 2)
+
+    def test_memory_backend_size_is_bounded(self):
+        """Test the memory backend evicts the least recently used entries."""
+        backend = MemoryBackend(max_entries=10, max_bytes=10)
+        backend.set(1, "/a", b"12345", 60, 0)
+        backend.set(1, "/b", b"12345", 60, 0)
+        backend.get(1, "/a")
+        backend.set(1, "/c", b"12345", 60, 0)
+        self.assertIsNone(backend.get(1, "/b"))
+        self.assertEqual(backend.get(1, "/a"), b"12345")
+        self.assertEqual(backend.size, 10)
+
+    def test_sqlite_backend_files_are_private(self):
+        """Test the SQLite file is created private to the user, and that a
+        directory others can write to is refused."""
+        path = os.path.join(self.directory, "private", "cache.sqlite")
+        SQLiteBackend(path, max_entries=2).count()
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+        self.assertEqual(
+            stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode), 0o700)
+
+        shared = os.path.join(self.directory, "shared")
+        os.mkdir(shared)
+        os.chmod(shared, 0o777)
+        with self.assertRaises(PermissionError):
+            private_file(os.path.join(shared, "cache.sqlite"))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """This class represents the per-user response cache test case"""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = create_app(config_name="testing")
+        self.client = self.app.test_client
+        response_cache.init_app(self.app)
+
+        with self.app.app_context():
+            db.create_all()
+            user = {"username": "nerd", "password": "nerdy",
+                    "email": "nerd@tests.com"}
+            self.client().post("/auth/register/", data=json.dumps(user),
+                               content_type="application/json")
+            res = self.client().post("/auth/login/", data=json.dumps(user),
+                                     content_type="application/json")
+            self.token = json.loads(res.data.decode())['token']
+
+    def test_listing_is_served_from_the_cache(self):
+        """Test a repeated GET is a cache hit until the user writes."""
+        headers = {"Authorization": self.token}
+        self.client().get('/api/v1/bucketlists/', headers=headers)
+        res = self.client().get('/api/v1/bucketlists/', headers=headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+        self.assertTrue(res.headers["ETag"])
+
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps({"name": "Fly a kite"}),
+                                 content_type="application/json",
+                                 headers=headers)
+        self.assertEqual(res.status_code, 201)
+        res = self.client().get('/api/v1/bucketlists/', headers=headers)
+        self.assertIn("Fly a kite", str(res.data))
+        self.assertEqual(response_cache.stats()["hits"], 1)
+
+    def test_streamed_responses_are_cached(self):
+        """Test a streamed item collection is cached once fully sent."""
+        headers = {"Authorization": self.token}
+        self.client().post('/api/v1/bucketlists/',
+                           data=json.dumps({"name": "Fly a kite"}),
+                           content_type="application/json", headers=headers)
+        self.client().post('/api/v1/bucketlists/1/items/',
+                           data=json.dumps({"name": "Buy string"}),
+                           content_type="application/json", headers=headers)
+        first = self.client().get('/api/v1/bucketlists/1/items/',
+                                  headers=headers)
+        self.assertIn("Buy string", str(first.data))
+        second = self.client().get('/api/v1/bucketlists/1/items/',
+                                   headers=headers)
+        self.assertEqual(response_cache.stats()["hits"], 1)
+        self.assertEqual(second.data, first.data)
+
+        self.client().put('/api/v1/bucketlists/1/items/1',
+                          data=json.dumps({"name": "Buy more string"}),
+                          content_type="application/json", headers=headers)
+        third = self.client().get('/api/v1/bucketlists/1/items/',
+                                  headers=headers)
+        self.assertIn("Buy more string", str(third.data))
+
+    def test_entries_are_stored_as_json(self):
+        """Test cached responses round-trip through JSON, body included."""
+        value = response_cache.encode(200, [("ETag", '"a"')], b"\x00body")
+        self.assertEqual(json.loads(value.decode())["status"], 200)
+        self.assertEqual(response_cache.decode(value),
+                         (200, [("ETag", '"a"')], b"\x00body"))
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import datetime
+import json
+import unittest
+
+from app import create_app, encoders
+
+
+class EncoderTestCase(unittest.TestCase):
+    """Test cases for the JSON encoder backends."""
+
+    def setUp(self):
+        self.app = create_app(config_name="testing")
+        self.data = {
+            "name": "Go to Borabora",
+            "date_created": datetime.datetime(2017, 7, 1, 9, 30, 15, 250),
+            "date_modified": datetime.datetime(2017, 7, 2, 10, 0),
+            "items": [{"done": False, "due": datetime.date(2017, 8, 1)}]
+        }
+
+    def encode(self, backend):
+        self.app.config["JSON_ENCODER_BACKEND"] = backend
+        encoder = encoders.Encoder()
+        encoder.init_app(self.app)
+        return encoder.dumps(self.data)
+
+    def test_stdlib_writes_iso_dates(self):
+        """Test the stdlib backend writes datetimes as ISO-8601."""
+        data = json.loads(self.encode("stdlib"))
+        self.assertEqual(data["date_created"], "2017-07-01T09:30:15.000250")
+        self.assertEqual(data["date_modified"], "2017-07-02T10:00:00")
+        self.assertEqual(data["items"][0]["due"], "2017-08-01")
+
+    @unittest.skipIf(encoders.orjson is None, "orjson is not installed")
+    def test_orjson_matches_stdlib(self):
+        """Test both backends produce the same JSON text."""
+        self.assertEqual(self.encode("orjson"), self.encode("stdlib"))
+
+    def test_auto_falls_back_to_stdlib(self):
+        """Test 'auto' uses the stdlib encoder when orjson is missing."""
+        orjson, encoders.orjson = encoders.orjson, None
+        try:
+            self.app.config["JSON_ENCODER_BACKEND"] = "auto"
+            encoder = encoders.Encoder()
+            encoder.init_app(self.app)
+            self.assertEqual(encoder.backend, "stdlib")
+            self.app.config["JSON_ENCODER_BACKEND"] = "orjson"
+            with self.assertRaises(RuntimeError):
+                encoder.init_app(self.app)
+        finally:
+            encoders.orjson = orjson
+
+    def test_responses_are_compact(self):
+        """Test jsonify writes compact JSON with ISO-8601 dates."""
+        with self.app.test_request_context():
+            response = encoders.jsonify(self.data)
+        body = response.get_data(as_text=True)
+        self.assertNotIn(", ", body)
+        self.assertIn('"date_modified":"2017-07-02T10:00:00"', body)
+        self.assertEqual(response.mimetype, "application/json")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.metrics import Metrics, metrics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MetricsTestCase(unittest.TestCase):
+    """Test cases for the per-route latency and SQL metrics."""
+
+    def setUp(self):
+        self.app = create_app(config_name="testing")
+        self.client = self.app.test_client
+        self.directory = tempfile.mkdtemp()
+        with self.app.app_context():
+            db.create_all()
+        user = {"username": "nerd", "password": "nerdy",
+                "email": "nerd@tests.com"}
+        self.client().post("/auth/register/", data=json.dumps(user),
+                           content_type="application/json")
+        res = self.client().post("/auth/login/", data=json.dumps(user),
+                                 content_type="application/json")
+        self.headers = {"Authorization": json.loads(res.data.decode())['token']}
+
+    def scrape(self):
+        res = self.client().get("/metrics", headers={
+            "Authorization": "Bearer " + self.app.config["METRICS_TOKEN"]})
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content_type.startswith("text/plain"))
+        return res.data.decode()
+
+    def test_requests_are_timed_per_endpoint_and_status(self):
+        """Test a request's latency, SQL, JWT and JSON time are recorded
+        under its endpoint, method and status."""
+        res = self.client().post("/api/v1/bucketlists/",
+                                 data=json.dumps({"name": "Go to Borabora"}),
+                                 content_type="application/json",
+                                 headers=self.headers)
+        self.assertEqual(res.status_code, 201)
+        text = self.scrape()
+        labels = '{endpoint="api.bucketlists",method="POST",status="201"'
+        self.assertIn('bucketlist_request_duration_seconds_count' + labels +
+                      '} 1', text)
+        self.assertIn('bucketlist_request_duration_seconds_bucket' + labels +
+                      ',le="+Inf"} 1', text)
+        samples = dict(line.rsplit(" ", 1) for line in text.splitlines()
+                       if line.startswith("bucketlist_"))
+        for name in ("sql_statements", "sql_seconds", "jwt_seconds",
+                     "serialization_seconds"):
+            self.assertGreater(
+                float(samples["bucketlist_{}_total{}}}".format(name, labels)]),
+                0, name)
+        self.assertIn('{endpoint="auth.login_view",method="POST",'
+                      'status="200"}', text)
+
+    def test_workers_are_summed(self):
+        """Test the numbers every worker wrote to METRICS_DIR are added up."""
+        directory, metrics.directory = metrics.directory, self.directory
+        try:
+            self.client().get("/api/v1/bucketlists/", headers=self.headers)
+            metrics.flush()
+            # another worker which saw the same requests
+            own, = os.listdir(self.directory)
+            shutil.copy(os.path.join(self.directory, own),
+                        os.path.join(self.directory, "metrics-1-1.json"))
+            text = self.scrape()
+        finally:
+            metrics.directory = directory
+        self.assertIn('bucketlist_request_duration_seconds_count{endpoint='
+                      '"api.bucketlists",method="GET",status="200"} 2', text)
+
+    def test_metrics_dir_is_private(self):
+        """Test METRICS_DIR is created private to the user, a shared one is
+        refused, and a relative one lies within RUNTIME_DIR."""
+        app = create_app(config_name="testing")
+        app.config["METRICS_DIR"] = os.path.join(self.directory, "private")
+        Metrics().init_app(app)
+        self.assertEqual(stat.S_IMODE(
+            os.stat(app.config["METRICS_DIR"]).st_mode), 0o700)
+
+        app.config["METRICS_DIR"] = os.path.join(self.directory, "shared")
+        os.mkdir(app.config["METRICS_DIR"])
+        os.chmod(app.config["METRICS_DIR"], 0o777)
+        with self.assertRaises(PermissionError):
+            Metrics().init_app(app)
+
+        env = dict(os.environ, METRICS_DIR="metrics-1")
+        output = subprocess.check_output(
+            [sys.executable, "-c", "from instance.config import Config; "
+             "print(Config.METRICS_DIR, Config.RUNTIME_DIR)"],
+            cwd=ROOT, env=env, universal_newlines=True)
+        metrics_dir, runtime_dir = output.split()
+        self.assertEqual(metrics_dir, os.path.join(runtime_dir, "metrics-1"))
+
+    def test_flushed_files_are_private(self):
+        """Test a flush writes a file only the user can read, leaving no
+        temporary file behind."""
+        directory, metrics.directory = metrics.directory, self.directory
+        try:
+            metrics.flush()
+        finally:
+            metrics.directory = directory
+        own, = os.listdir(self.directory)
+        self.assertTrue(own.endswith(".json"))
+        self.assertEqual(stat.S_IMODE(
+            os.stat(os.path.join(self.directory, own)).st_mode), 0o600)
+
+    def test_disabled_metrics_add_no_hooks(self):
+        """Test a disabled app has no metrics hooks and no endpoint."""
+        app = create_app(config_name="testing")
+        hooks = len(app.before_request_funcs.get(None, []))
+        app.config["METRICS_ENABLED"] = False
+        Metrics().init_app(app)
+        self.assertEqual(len(app.before_request_funcs.get(None, [])), hooks)
+
+        enabled, metrics.enabled = metrics.enabled, False
+        try:
+            res = self.client().get("/metrics", headers={
+                "Authorization": "Bearer " + self.app.config["METRICS_TOKEN"]})
+            self.assertEqual(res.status_code, 404)
+        finally:
+            metrics.enabled = enabled
+
+    def test_metrics_need_the_token(self):
+        """Test both metrics endpoints refuse requests without the token,
+        and do not exist when none is configured."""
+        for path in ("/metrics", "/metrics/pool"):
+            self.assertEqual(self.client().get(path).status_code, 401)
+            res = self.client().get(path, headers={
+                "Authorization": "Bearer not-the-token"})
+            self.assertEqual(res.status_code, 401)
+        token, self.app.config["METRICS_TOKEN"] = (
+            self.app.config["METRICS_TOKEN"], None)
+        try:
+            for path in ("/metrics", "/metrics/pool"):
+                res = self.client().get(path, headers={
+                    "Authorization": "Bearer " + token})
+                self.assertEqual(res.status_code, 404)
+        finally:
+            self.app.config["METRICS_TOKEN"] = token
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
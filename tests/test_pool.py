@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import unittest
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import TimeoutError
+
+from app import create_app, db
+from app.pool import InstrumentedQueuePool
+from app.warmup import dispose_engines, warm_up
+
+try:
+    import gevent
+except ImportError:
+    gevent = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PoolTestCase(unittest.TestCase):
+    """Test cases for the instrumented connection pool."""
+
+    def setUp(self):
+        self.app = create_app(config_name="testing")
+        self.pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"),
+                                          pool_size=1, max_overflow=1,
+                                          timeout=0.01)
+
+    def test_pool_counts_checkouts_and_overflow(self):
+        """Test the pool reports connections in use and beyond its size."""
+        first, second = self.pool.connect(), self.pool.connect()
+        stats = self.pool.stats()
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["checked_out"], 2)
+        self.assertEqual(stats["overflow"], 1)
+        first.close()
+        second.close()
+        self.assertEqual(self.pool.stats()["checked_out"], 0)
+
+    def test_pool_counts_timeouts(self):
+        """Test waits for an exhausted pool are timed and counted."""
+        connections = [self.pool.connect(), self.pool.connect()]
+        with self.assertRaises(TimeoutError):
+            self.pool.connect()
+        stats = self.pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertGreaterEqual(stats["wait_seconds_max"], 0.01)
+        for connection in connections:
+            connection.close()
+
+    def test_pool_options(self):
+        """Test server databases get the instrumented pool and pre-ping,
+        while SQLite keeps its own pool."""
+        self.app.config["SQLALCHEMY_POOL_PRE_PING"] = True
+        options = {"pool_size": 5, "max_overflow": 10, "pool_recycle": 1800}
+        db.apply_driver_hacks(self.app, make_url("postgresql://localhost/db"),
+                              options)
+        self.assertIs(options["poolclass"], InstrumentedQueuePool)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["pool_size"], 5)
+        self.assertEqual(options["connect_args"]["options"], "-c timezone=UTC")
+
+        options = {"pool_size": 5, "max_overflow": 10, "pool_recycle": 1800}
+        db.apply_driver_hacks(self.app, make_url("sqlite:////tmp/test.db"),
+                              options)
+        self.assertNotIn("pool_size", options)
+        self.assertNotIn("max_overflow", options)
+
+    def test_pool_metrics_endpoint(self):
+        """Test the pool metrics name the worker process."""
+        res = self.app.test_client().get("/metrics/pool", headers={
+            "Authorization": "Bearer " + self.app.config["METRICS_TOKEN"]})
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("pid", json.loads(res.data.decode()))
+
+    def test_worker_warm_up(self):
+        """Test a worker can warm up and drop its inherited connections."""
+        with self.app.app_context():
+            db.create_all()
+        try:
+            warm_up(self.app)
+            dispose_engines(self.app)
+        finally:
+            with self.app.app_context():
+                db.session.remove()
+                db.drop_all()
+
+
+    @unittest.skipIf(gevent is None, "gevent is not installed")
+    def test_gevent_pool_size(self):
+        """Test the app run_async.py serves gets the gevent pool size,
+        whatever configuration was imported before it, and hashes
+        passwords inline rather than in a process pool."""
+        env = dict(os.environ, APP_SETTINGS="staging",
+                   DATABASE_URL=self.app.config["SQLALCHEMY_DATABASE_URI"],
+                   SECRET_KEY=self.app.config["SECRET_KEY"] or "secret",
+                   PASSWORD_HASH_WORKERS="2")
+        output = subprocess.check_output(
+            [sys.executable, "-c",
+             "import instance.config, run_async; "
+             "print(run_async.app.config['SQLALCHEMY_POOL_SIZE'], "
+             "run_async.app.config['PASSWORD_HASH_WORKERS'])"],
+            cwd=ROOT, env=env, universal_newlines=True)
+        pool_size, hash_workers = output.split()[-2:]
+        self.assertEqual(int(pool_size), self.app.config["GEVENT_POOL_SIZE"])
+        self.assertEqual(int(hash_workers), 0)
+        self.assertNotEqual(self.app.config["SQLALCHEMY_POOL_SIZE"],
+                            self.app.config["GEVENT_POOL_SIZE"])
+
+    @unittest.skipIf(gevent is None, "gevent is not installed")
+    def test_gevent_hashing_leaves_greenlets_running(self):
+        """Test a worker on gevent hashes off its event loop, serving its
+        other greenlets meanwhile."""
+        env = dict(os.environ, APP_SETTINGS="testing",
+                   SECRET_KEY=self.app.config["SECRET_KEY"] or "secret")
+        output = subprocess.check_output(
+            [sys.executable, "-c", """
+import gevent, run_async
+from app.hashing import check_password, hash_password
+ticks = []
+def tick():
+    while True:
+        ticks.append(1)
+        gevent.sleep(0.001)
+ticker = gevent.spawn(tick)
+with run_async.app.app_context():
+    run_async.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:300000'
+    assert check_password(hash_password('secret'), 'secret')
+ticker.kill()
+print(len(ticks))
+"""], cwd=ROOT, env=env, universal_newlines=True)
+        self.assertGreater(int(output.split()[-1]), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from app import create_app, db
+from app.cache import response_cache
+from app.replica import REPLICA_BIND, replica
+from instance.config import app_config
+
+
+class ReplicaTestCase(unittest.TestCase):
+    """Test cases for routing reads to a replica, here a second database
+    which never receives the primary's writes."""
+
+    def setUp(self):
+        """Define test variables and initialize app."""
+        self.app = create_app(config_name="testing")
+        self.directory = tempfile.mkdtemp()
+        self.app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: "sqlite:///{}".format(
+            os.path.join(self.directory, "replica.db"))}
+        # answer every request from the database
+        self.app.config["RESPONSE_CACHE_BACKEND"] = None
+        response_cache.init_app(self.app)
+        replica.init_app(self.app)
+        self.client = self.app.test_client
+
+        with self.app.app_context():
+            db.create_all()
+            db.metadata.create_all(bind=db.get_engine(self.app, REPLICA_BIND))
+            user = {"username": "nerd", "password": "nerdy",
+                    "email": "nerd@tests.com"}
+            self.client().post("/auth/register/", data=json.dumps(user),
+                               content_type="application/json")
+            res = self.client().post("/auth/login/", data=json.dumps(user),
+                                     content_type="application/json")
+            self.headers = {"Authorization": json.loads(res.data.decode())['token']}
+
+    def create_bucketlist(self):
+        res = self.client().post('/api/v1/bucketlists/',
+                                 data=json.dumps({'name': 'Go to Borabora'}),
+                                 content_type="application/json",
+                                 headers=self.headers)
+        self.assertEqual(res.status_code, 201)
+
+    def listed_bucketlists(self):
+        res = self.client().get('/api/v1/bucketlists/', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        return json.loads(res.data.decode())['bucketlists']
+
+    def test_reads_go_to_replica(self):
+        """Test GET requests read the replica and writes the primary."""
+        self.create_bucketlist()
+        # forget the write, as if the window had passed
+        replica.init_app(self.app)
+        self.assertEqual(self.listed_bucketlists(), [])
+        with self.app.app_context():
+            self.assertEqual(len(db.session.execute(
+                'SELECT * FROM bucketlists').fetchall()), 1)
+
+    def test_reads_follow_own_writes(self):
+        """Test a user reads from the primary right after writing."""
+        self.create_bucketlist()
+        self.assertEqual(len(self.listed_bucketlists()), 1)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Test reads go to the primary when the replica lags."""
+        self.create_bucketlist()
+        replica.init_app(self.app)
+        replica.max_lag = -1
+        self.assertEqual(len(self.listed_bucketlists()), 1)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        """Test reads go to the primary when the replica is down."""
+        self.create_bucketlist()
+        replica.init_app(self.app)
+        self.app.config["SQLALCHEMY_BINDS"] = {
+            REPLICA_BIND: "sqlite:///{}".format(
+                os.path.join(self.directory, "missing", "replica.db"))}
+        self.assertEqual(len(self.listed_bucketlists()), 1)
+
+    def test_sqlite_writers_are_private(self):
+        """Test the writers shared through SQLite live in a file private to
+        the user, in the private runtime directory by default."""
+        config = app_config["production"]
+        self.assertEqual(os.path.dirname(config.REPLICA_WRITERS_PATH),
+                         config.RUNTIME_DIR)
+        path = os.path.join(self.directory, "runtime", "writers.sqlite")
+        self.app.config["REPLICA_WRITERS_BACKEND"] = "sqlite"
+        self.app.config["REPLICA_WRITERS_PATH"] = path
+        replica.init_app(self.app)
+        self.create_bucketlist()
+        self.assertTrue(replica.recently_wrote(1))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o600)
+
+    def test_no_writers_are_remembered_without_a_replica(self):
+        """Test writes touch no writers store when there is no replica."""
+        path = os.path.join(self.directory, "runtime", "writers.sqlite")
+        self.app.config["SQLALCHEMY_BINDS"] = {}
+        self.app.config["REPLICA_WRITERS_BACKEND"] = "sqlite"
+        self.app.config["REPLICA_WRITERS_PATH"] = path
+        replica.init_app(self.app)
+        self.create_bucketlist()
+        self.assertFalse(replica.recently_wrote(1))
+        self.assertFalse(os.path.exists(path))
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        self.app.config.from_object(app_config["testing"])
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        shutil.rmtree(self.directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
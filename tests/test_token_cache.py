@@ -0,0 +1,46 @@
+import time
+import unittest
+
+from app.token_cache import TokenCache
+
+
+class TokenCacheTest(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def setUp(self):
+        self.cache = TokenCache(maxsize=2)
+        self.expires = time.time() + 600
+
+    def test_cached_token_is_a_hit(self):
+        """Test a verified token is served from the cache."""
+        self.assertIsNone(self.cache.get("token"))
+        self.cache.set("token", 1, self.expires)
+        self.assertEqual(self.cache.get("token"), 1)
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_expired_token_is_dropped(self):
+        """Test a token is never served past its own expiry."""
+        self.cache.set("token", 1, time.time() - 1)
+        self.assertIsNone(self.cache.get("token"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_least_recently_used_token_is_evicted(self):
+        """Test the cache stays within its bounds."""
+        self.cache.set("first", 1, self.expires)
+        self.cache.set("second", 2, self.expires)
+        self.cache.get("first")
+        self.cache.set("third", 3, self.expires)
+        self.assertIsNone(self.cache.get("second"))
+        self.assertEqual(self.cache.get("first"), 1)
+        self.assertEqual(self.cache.get("third"), 3)
+
+    def test_disabled_cache_stores_nothing(self):
+        """Test a cache of size 0 never holds a token."""
+        cache = TokenCache(maxsize=0)
+        cache.set("token", 1, self.expires)
+        self.assertIsNone(cache.get("token"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from flask import jsonify
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User, BucketList
+from app.transaction import unit_of_work
+
+
+class UnitOfWorkTestCase(unittest.TestCase):
+    """Test cases for the request scoped transaction."""
+
+    def setUp(self):
+        self.app = create_app(config_name="testing")
+        self.client = self.app.test_client
+        self.committed = []
+
+        def save_bucketlists(status):
+            """Saves two bucketlists, then answers with the given status."""
+            for name in ("Go to Borabora", "Climb Kilimanjaro"):
+                BucketList(name=name, created_by=self.user_id).save()
+            unit_of_work.on_commit(self.committed.append, status)
+            if status == 500:
+                raise RuntimeError("view failed")
+            return jsonify({}), status
+
+        self.app.add_url_rule("/save/<int:status>", "save", save_bucketlists)
+        with self.app.app_context():
+            db.create_all()
+            user = User(username="nerd", password="nerdy",
+                        email="nerd@gmail.com")
+            user.save()
+            self.user_id = user.id
+
+    def count_bucketlists(self):
+        with self.app.app_context():
+            return BucketList.query.count()
+
+    def test_one_commit_per_request(self):
+        """Test every save of a request is committed together at its end."""
+        commits = []
+        with self.app.app_context():
+            engine = db.engine
+        listener = lambda connection: commits.append(connection)
+        event.listen(engine, "commit", listener)
+        try:
+            res = self.client().get("/save/201")
+        finally:
+            event.remove(engine, "commit", listener)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(self.count_bucketlists(), 2)
+        self.assertEqual(self.committed, [201])
+
+    def test_error_response_rolls_back(self):
+        """Test nothing is written when the view answers with an error."""
+        res = self.client().get("/save/400")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.count_bucketlists(), 0)
+        self.assertEqual(self.committed, [])
+
+    def test_exception_rolls_back(self):
+        """Test nothing is written when the view raises."""
+        with self.app.test_request_context("/save/500"):
+            self.app.preprocess_request()
+            with self.assertRaises(RuntimeError):
+                self.app.dispatch_request()
+            self.app.do_teardown_request(RuntimeError("view failed"))
+            self.assertEqual(BucketList.query.count(), 0)
+        self.assertEqual(self.committed, [])
+
+    def test_commit_now_inside_request(self):
+        """Test commit_now persists writes even if the request then fails."""
+        def save_then_fail():
+            BucketList(name="Go to Borabora", created_by=self.user_id).save()
+            unit_of_work.commit_now()
+            BucketList(name="Climb Kilimanjaro", created_by=self.user_id).save()
+            return jsonify({}), 400
+
+        self.app.add_url_rule("/commit-now", "commit_now", save_then_fail)
+        res = self.client().get("/commit-now")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(self.count_bucketlists(), 1)
+
+    def tearDown(self):
+        """teardown all initialized variables."""
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
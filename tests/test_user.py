@@ -2,6 +2,7 @@ import unittest
 import json
 
 from app import create_app, db
+from app.models import User
 
 
 class UserTest(unittest.TestCase):
@@ -82,6 +83,21 @@ class UserTest(unittest.TestCase):
         self.assertEqual(final_result["message"],
                          "Error. The username or password cannot be empty")
 
+    def test_outdated_password_hash_is_upgraded_on_login(self):
+        """Test login rehashes a password stored with an old work factor."""
+        res = self.client().post("/auth/register/", data=json.dumps(self.user),
+                                 content_type="application/json")
+        self.assertEqual(res.status_code, 201)
+
+        self.app.config["PASSWORD_HASH_METHOD"] = "pbkdf2:sha256:2000"
+        login_res = self.client().post("/auth/login/", data=json.dumps(self.user),
+                                       content_type="application/json")
+        self.assertEqual(login_res.status_code, 200)
+        with self.app.app_context():
+            user = User.query.filter_by(username=self.user["username"]).first()
+            self.assertTrue(user.user_password.startswith("pbkdf2:sha256:2000$"))
+            self.assertTrue(user.verify_password(self.user["password"]))
+
     def tearDown(self):
         """teardown all initialized variables."""
         with self.app.app_context():